@@ -0,0 +1,8 @@
+"""
+Allow running the plugin as: python -m git_lfs_sempress
+"""
+
+from .cli import main
+
+if __name__ == '__main__':
+    main(prog_name='git-lfs-sempress')
@@ -3,12 +3,12 @@ Command-line interface for git-lfs-sempress.
 """
 
 import click
+import os
 import sys
 import logging
 from pathlib import Path
 from . import __version__
-from .filter import run_clean_filter, run_smudge_filter
-from .config import Config
+from .config import CONFIG_FILENAMES, Config
 
 logger = logging.getLogger(__name__)
 
@@ -16,9 +16,16 @@ logger = logging.getLogger(__name__)
 @click.group()
 @click.version_option(version=__version__)
 @click.option('--verbose', '-v', is_flag=True, help='Enable verbose logging')
-def main(verbose):
+@click.pass_context
+def main(ctx, verbose):
     """Git LFS Sempress Plugin - Automatic semantic compression for Git LFS"""
-    log_level = logging.DEBUG if verbose else logging.INFO
+    if verbose:
+        log_level = logging.DEBUG
+    elif ctx.invoked_subcommand in ('clean', 'smudge', 'process'):
+        # Git shows filter stderr for every file: only report problems
+        log_level = logging.WARNING
+    else:
+        log_level = logging.INFO
     logging.basicConfig(
         level=log_level,
         format='[sempress] %(levelname)s: %(message)s'
@@ -33,6 +40,7 @@ def clean(filename):
     
     Usage: git-lfs-sempress clean %f
     """
+    from .filter import run_clean_filter
     run_clean_filter(filename)
 
 
@@ -44,9 +52,21 @@ def smudge(filename):
     
     Usage: git-lfs-sempress smudge %f
     """
+    from .filter import run_smudge_filter
     run_smudge_filter(filename)
 
 
+@main.command()
+def process():
+    """
+    Long-running filter process: clean/smudge many files (called by Git internally).
+    
+    Usage: git-lfs-sempress process
+    """
+    from .filter import run_process_filter
+    run_process_filter()
+
+
 @main.command()
 def init():
     """
@@ -65,10 +85,11 @@ def init():
         
         click.echo("Initializing Sempress LFS filter...\n")
         
-        # Create .sempress.yml
+        # Create .sempress.yml unless either config file is already here
+        existing = [Path.cwd() / name for name in CONFIG_FILENAMES if (Path.cwd() / name).exists()]
         config_path = Path.cwd() / '.sempress.yml'
-        if config_path.exists():
-            click.echo(f"OK: Config file already exists: {config_path}")
+        if existing:
+            click.echo(f"OK: Config file already exists: {existing[0]}")
         else:
             Config.create_default_config(config_path)
             click.echo(f"OK: Created config file: {config_path}")
@@ -79,6 +100,7 @@ def init():
         commands = [
             ('git', 'config', 'filter.lfs-sempress.clean', 'git-lfs-sempress clean %f'),
             ('git', 'config', 'filter.lfs-sempress.smudge', 'git-lfs-sempress smudge %f'),
+            ('git', 'config', 'filter.lfs-sempress.process', 'git-lfs-sempress process'),
             ('git', 'config', 'filter.lfs-sempress.required', 'true'),
         ]
         
@@ -121,15 +143,20 @@ def track(pattern):
         # Create or append to .gitattributes
         line = f"{pattern} filter=lfs-sempress diff=lfs merge=lfs -text\n"
         
-        # Check if already tracked
-        if gitattributes.exists():
-            content = gitattributes.read_text()
-            if pattern in content and 'lfs-sempress' in content:
+        # Single open: read existing entries, append only if absent
+        with open(gitattributes, 'a+') as f:
+            f.seek(0)
+            content = f.read()
+            
+            # Check if already tracked
+            if any(entry.split()[:1] == [pattern] and 'filter=lfs-sempress' in entry
+                   for entry in content.splitlines()):
                 click.echo(f"OK: Pattern '{pattern}' already tracked")
                 return
-        
-        # Append to .gitattributes
-        with open(gitattributes, 'a') as f:
+            
+            # Append to .gitattributes
+            if content and not content.endswith('\n'):
+                f.write('\n')
             f.write(line)
         
         click.echo(f"OK: Now tracking: {pattern}")
@@ -141,39 +168,45 @@ def track(pattern):
         sys.exit(1)
 
 
+def _walk_csvs(root):
+    """Yield scandir entries for CSV files under root, pruning .git directories"""
+    try:
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != '.git':
+                        yield from _walk_csvs(entry.path)
+                elif entry.name.endswith('.csv'):
+                    yield entry
+    except OSError:
+        return
+
+
 @main.command()
 def analyze():
     """
     Analyze repository and estimate potential compression savings.
     """
     try:
-        import glob
-        
         click.echo("Analyzing repository for CSV files...\n")
         
-        # Find all CSV files
-        csv_files = list(Path.cwd().rglob('*.csv'))
-        
-        if not csv_files:
-            click.echo("No CSV files found in repository")
-            return
-        
+        cwd = Path.cwd()
         total_size = 0
         file_info = []
         
-        for csv_file in csv_files:
-            if '.git' in str(csv_file):
-                continue
-            
+        # Find all CSV files. On POSIX, entry.stat() costs one stat call per
+        # file (only Windows fills it from the directory listing); the walk's
+        # is_dir() checks use d_type where the filesystem reports it
+        for entry in _walk_csvs(cwd):
             try:
-                size = csv_file.stat().st_size
-                total_size += size
-                file_info.append((csv_file.relative_to(Path.cwd()), size))
-            except:
+                size = entry.stat().st_size
+            except OSError:
                 continue
+            total_size += size
+            file_info.append((Path(entry.path).relative_to(cwd), size))
         
         if not file_info:
-            click.echo("No accessible CSV files found")
+            click.echo("No CSV files found in repository")
             return
         
         # Sort by size
@@ -244,13 +277,12 @@ def stats():
         click.echo("Sempress Statistics\n")
         click.echo("OK: Filter configured: Yes")
         
-        # Check for .sempress.yml
-        config_path = Path.cwd() / '.sempress.yml'
-        if config_path.exists():
-            click.echo(f"OK: Config file: {config_path}")
+        # Find .sempress.json/.sempress.yml the way the filter does
+        config = Config()
+        if config.config_path:
+            click.echo(f"OK: Config file: {config.config_path}")
             
-            # Load and display config
-            config = Config(config_path)
+            # Display config
             comp_config = config.get_compression_config()
             click.echo(f"\n  Compression settings:")
             click.echo(f"    k: {comp_config.get('k', 64)}")
@@ -283,6 +315,44 @@ def stats():
         sys.exit(1)
 
 
+@main.group()
+def cache():
+    """
+    Manage the compressed-output cache (.git/sempress-cache).
+    """
+
+
+@cache.command()
+@click.option('--max-mb', type=float, default=None,
+              help='Size to trim the cache to (default: cache.max_size_mb; 0 empties it)')
+def prune(max_mb):
+    """
+    Remove least recently used cache entries beyond the size limit.
+    
+    Example: git lfs-sempress cache prune --max-mb 256
+    """
+    try:
+        from .filter import SempressFilter, prune_cache
+        
+        filter_obj = SempressFilter()
+        if filter_obj.cache_dir is None:
+            click.echo("Error: No cache directory (not a Git repository?)", err=True)
+            sys.exit(1)
+        
+        if max_mb is None:
+            max_mb = filter_obj.config.get_cache_config().get('max_size_mb', 0)
+            if not max_mb:
+                click.echo("cache.max_size_mb is 0 (no limit); pass --max-mb to prune")
+                return
+        
+        removed, freed = prune_cache(filter_obj.cache_dir, int(max_mb * 1024 * 1024))
+        click.echo(f"OK: Removed {removed} cache entries ({freed / (1024 * 1024):.2f} MB)")
+        
+    except Exception as e:
+        click.echo(f"Error: Cache prune failed: {e}", err=True)
+        sys.exit(1)
+
+
 @main.command()
 @click.argument('original', type=click.Path(exists=True))
 @click.argument('reconstructed', type=click.Path(exists=True))
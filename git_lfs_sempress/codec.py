@@ -0,0 +1,182 @@
+"""
+Sempress encode/decode backend.
+Holds everything that needs numpy, pandas and sempress (which pulls in
+scikit-learn), so it is only imported once a blob is really (de)compressed.
+"""
+
+import sys
+import logging
+import numpy as np
+import pandas as pd
+
+from .compression import SMP_MAGIC, SMP_RESIDUAL_MAGIC
+
+# Import sempress from the installed package
+try:
+    from sempress import encode_csv, decode_to_csv
+    from sempress.table_encoder import EncodeConfig
+except ImportError:
+    logging.error("Sempress library not found. Please install: pip install /path/to/sempress")
+    sys.exit(1)
+
+try:
+    # In-memory decode entry point (accepts raw .smp bytes)
+    from sempress.table_decoder import decode_to_dataframe, _decode_payload
+    from sempress.container import unpack_container
+except ImportError:
+    decode_to_dataframe = None
+
+# sempress release encode_frame was written against. It rebuilds
+# encode_csv's payload from private helpers, so any other release
+# goes through the public encode_csv instead
+SEMPRESS_VERSION = "0.3.2"
+
+try:
+    # Building blocks of sempress.table_encoder.encode_csv, so DataFrames
+    # parsed here can be encoded without a CSV round-trip
+    from sempress import __version__ as _sempress_version
+    from sempress.table_encoder import _fit_codebook, _encode_column
+    from sempress.utils import infer_schema, to_bytes
+    from sempress.container import pack_container
+except ImportError:
+    _fit_codebook = None
+else:
+    if _sempress_version != SEMPRESS_VERSION:
+        logging.getLogger(__name__).debug(
+            f"sempress {_sempress_version} is not {SEMPRESS_VERSION}, encoding via encode_csv")
+        _fit_codebook = None
+
+logger = logging.getLogger(__name__)
+
+# Storage dtypes for the residual_precision setting. fp32 is sempress's
+# native residual format; narrower widths go in a payload section of their
+# own (residuals_q) with a per-column scale
+RESIDUAL_DTYPES = {'fp32': np.float32, 'fp16': np.float16, 'int8': np.int8}
+
+
+def _quantize_residuals(delta: np.ndarray, precision: str):
+    """Narrow a float32 residual array, returning (bytes, scale)"""
+    if precision == 'fp16':
+        return delta.astype(np.float16).tobytes(), 1.0
+    
+    # Symmetric int8: the largest residual maps to +/-127
+    peak = float(np.abs(delta).max()) if len(delta) else 0.0
+    scale = peak / 127.0 if peak > 0 else 1.0
+    q = np.round(delta / scale).astype(np.int8)
+    return q.tobytes(), scale
+
+
+def encode_frame(df: pd.DataFrame, encode_config, residual_precision: str = 'fp32') -> bytes:
+    """
+    Encode a parsed DataFrame into a Sempress .smp container.
+    
+    Frame-level twin of sempress.table_encoder.encode_csv, producing the
+    same payload (decodable by decode_to_csv). Columns are handed to the
+    codebook fit in column-major (SoA) layout: one contiguous NumPy array
+    per numeric column rather than per-access slices of a 2-D block.
+    
+    Args:
+        df: Parsed CSV data
+        encode_config: sempress EncodeConfig
+        residual_precision: Storage width for residual columns (fp32|fp16|int8)
+        
+    Returns:
+        Compressed .smp file as bytes
+    """
+    schema = infer_schema(df)
+    
+    # String columns are always stored losslessly, after any manual locks
+    manual_locks = [c for c in encode_config.lock_cols if c in df.columns]
+    auto_locks = [c for c, meta in schema.items() if meta.get("dtype") != "numeric" and c not in manual_locks]
+    locked_cols = manual_locks + auto_locks
+    
+    columns = {
+        c: np.ascontiguousarray(df[c].to_numpy())
+        for c in df.columns if c not in locked_cols
+    }
+    
+    codebooks = {}
+    idx_streams = {}
+    uncertain_cells = {}
+    residuals = {}
+    quantized = {}
+    residual_scales = {}
+    
+    for c, values in columns.items():
+        codebook = _fit_codebook(values, encode_config.k, encode_config.random_state)
+        codebooks[c] = codebook
+        encoded = _encode_column(values, codebook)
+        idx_streams[c] = encoded["indices"]
+        
+        # Cells whose relative quantization error exceeds the threshold
+        uncertain = np.flatnonzero(encoded["qerr"] > encode_config.uncertainty_thresh)
+        if len(uncertain) > 0:
+            uncertain_cells[c] = uncertain.astype(np.int32).tolist()
+        
+        if c in encode_config.residual_cols:
+            delta = values.astype(np.float32) - encoded["recon"].astype(np.float32)
+            if residual_precision == 'fp32':
+                residuals[c] = delta.tobytes()
+            else:
+                quantized[c], residual_scales[c] = _quantize_residuals(delta, residual_precision)
+    
+    payload = {
+        "domain": "table",
+        "schema": schema,
+        "n_rows": len(df),
+        "columns": list(df.columns),
+        "locked_cols": locked_cols,
+        "residual_cols": encode_config.residual_cols,
+        "locked_blob": to_bytes(df[locked_cols]) if locked_cols else b"",
+        "codebooks": {c: cb.astype(np.float16).tobytes() for c, cb in codebooks.items()},
+        "k": encode_config.k,
+        "idx_streams": idx_streams,
+        "index_dtype": "uint8" if encode_config.k <= 256 else "uint16",
+        "codebook_dtype": "float16",
+        "uncertain": uncertain_cells,
+        "residuals": residuals,
+        "model": {"type": "kmeans-per-column", "random_state": encode_config.random_state},
+        "meta": {
+            "uncertainty_thresh": encode_config.uncertainty_thresh,
+            "auto_locked_cols": auto_locks,
+            "manual_locked_cols": manual_locks,
+        },
+    }
+    
+    if not quantized:
+        return pack_container(payload)
+    
+    # Stock sempress decoders would ignore these keys, so the blob gets a
+    # header they refuse; only decode_frame applies them
+    payload["residuals_q"] = quantized
+    payload["residual_scales"] = residual_scales
+    payload["residual_precision"] = residual_precision
+    return SMP_RESIDUAL_MAGIC + pack_container(payload)[len(SMP_MAGIC):]
+
+
+def decode_frame(smp_data: bytes) -> pd.DataFrame:
+    """
+    Decode a Sempress .smp container into a DataFrame.
+    
+    Wraps sempress's payload decoder and adds back any narrowed residuals
+    written by encode_frame (blobs headed SMP_RESIDUAL_MAGIC).
+    
+    Args:
+        smp_data: Compressed .smp file content
+        
+    Returns:
+        Reconstructed DataFrame
+    """
+    if smp_data.startswith(SMP_RESIDUAL_MAGIC):
+        smp_data = SMP_MAGIC + smp_data[len(SMP_RESIDUAL_MAGIC):]
+    payload = unpack_container(smp_data)
+    df, _ = _decode_payload(payload)
+    
+    quantized = payload.get("residuals_q")
+    if quantized:
+        dtype = RESIDUAL_DTYPES[payload["residual_precision"]]
+        for c, raw in quantized.items():
+            delta = np.frombuffer(raw, dtype=dtype).astype(np.float32) * np.float32(payload["residual_scales"][c])
+            df[c] = (df[c].to_numpy(dtype=np.float32) + delta).astype(np.float32)
+    
+    return df
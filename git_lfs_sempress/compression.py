@@ -1,144 +1,271 @@
-"""
-Compression wrapper for Sempress library.
-Interfaces with the sempress encoder/decoder.
-"""
-
-import sys
-import tempfile
-from pathlib import Path
-from typing import Optional, Dict, Any
-import logging
-
-# Import sempress from the installed package
-try:
-    from sempress import encode_csv, decode_to_csv
-    from sempress.table_encoder import EncodeConfig
-except ImportError:
-    logging.error("Sempress library not found. Please install: pip install /path/to/sempress")
-    sys.exit(1)
-
-logger = logging.getLogger(__name__)
-
-
-class SempressCompressor:
-    """Wrapper around Sempress compression library"""
-    
-    def __init__(self, config: Optional[Dict[str, Any]] = None):
-        """
-        Initialize compressor with configuration.
-        
-        Args:
-            config: Configuration dictionary with compression settings
-        """
-        self.config = config or {}
-        self.lock_cols = self.config.get('lock_cols', [])
-        self.residual_cols = self.config.get('residual_cols', [])
-        self.k = self.config.get('k', 64)
-        self.uncertainty_threshold = self.config.get('uncertainty_threshold', 0.2)
-        self.auto_lock = self.config.get('auto_lock', True)
-    
-    def compress(self, csv_data: bytes) -> bytes:
-        """
-        Compress CSV data to .smp format.
-        
-        Args:
-            csv_data: Raw CSV file content as bytes
-            
-        Returns:
-            Compressed .smp file as bytes
-        """
-        # Write CSV to temporary file (Sempress needs file path)
-        with tempfile.NamedTemporaryFile(mode='wb', suffix='.csv', delete=False) as tmp:
-            tmp.write(csv_data)
-            tmp_path = tmp.name
-        
-        try:
-            # Create Sempress configuration
-            encode_config = EncodeConfig(
-                lock_cols=self.lock_cols,
-                residual_cols=self.residual_cols,
-                k=self.k,
-                uncertainty_thresh=self.uncertainty_threshold,
-                random_state=42
-            )
-            
-            # Compress with Sempress
-            logger.info(f"Compressing CSV with k={self.k}, lock_cols={self.lock_cols}")
-            compressed_blob = encode_csv(tmp_path, encode_config)
-            
-            # Calculate compression ratio
-            original_size = len(csv_data)
-            compressed_size = len(compressed_blob)
-            ratio = original_size / compressed_size if compressed_size > 0 else 0
-            
-            logger.info(f"Compression complete: {original_size} -> {compressed_size} bytes ({ratio:.2f}x)")
-            
-            return compressed_blob
-            
-        finally:
-            # Clean up temp file
-            Path(tmp_path).unlink(missing_ok=True)
-    
-    def decompress(self, smp_data: bytes) -> bytes:
-        """
-        Decompress .smp data back to CSV format.
-        
-        Args:
-            smp_data: Compressed .smp file content as bytes
-            
-        Returns:
-            Original CSV file as bytes
-        """
-        # Write .smp to temporary file
-        with tempfile.NamedTemporaryFile(mode='wb', suffix='.smp', delete=False) as tmp_smp:
-            tmp_smp.write(smp_data)
-            smp_path = tmp_smp.name
-        
-        # Create temporary output path
-        csv_path = smp_path.replace('.smp', '_recon.csv')
-        
-        try:
-            # Decompress with Sempress
-            logger.info(f"Decompressing .smp file ({len(smp_data)} bytes)")
-            decode_to_csv(smp_path, csv_path)
-            
-            # Read reconstructed CSV
-            with open(csv_path, 'rb') as f:
-                csv_data = f.read()
-            
-            logger.info(f"Decompression complete: {len(smp_data)} -> {len(csv_data)} bytes")
-            
-            return csv_data
-            
-        finally:
-            # Clean up temp files
-            Path(smp_path).unlink(missing_ok=True)
-            Path(csv_path).unlink(missing_ok=True)
-    
-    def estimate_compression_ratio(self, csv_data: bytes) -> float:
-        """
-        Estimate compression ratio without full compression.
-        Quick heuristic based on file size and numeric density.
-        
-        Args:
-            csv_data: Raw CSV file content
-            
-        Returns:
-            Estimated compression ratio
-        """
-        # Simple heuristic: larger numeric-heavy files compress better
-        # This is fast and avoids full compression for analysis
-        
-        size_mb = len(csv_data) / (1024 * 1024)
-        
-        # Baseline estimate: 3-5x for typical numeric CSVs
-        if size_mb < 1:
-            return 2.5  # Small files don't compress as well
-        elif size_mb < 10:
-            return 4.0
-        elif size_mb < 100:
-            return 5.5
-        else:
-            return 7.0  # Large files with repetitive patterns
-        
-        # TODO: Improve this by sampling the CSV and checking numeric density
+"""
+Compression wrapper for Sempress library.
+Interfaces with the sempress encoder/decoder.
+"""
+
+import io
+import tempfile
+from functools import cached_property
+from pathlib import Path
+from typing import Optional, Any, Mapping
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every .smp blob starts with the Sempress container header
+# (sempress.container.MAGIC), so it doubles as a compressed-data marker
+SMP_MAGIC = b"SEMZ1\x00"
+
+# Header of blobs holding fp16/int8 residuals. Stock sempress decoders
+# would drop those silently, so the changed header makes them refuse the
+# blob instead; codec.decode_frame reads both
+SMP_RESIDUAL_MAGIC = b"SEMZ1\x01"
+SMP_MAGICS = (SMP_MAGIC, SMP_RESIDUAL_MAGIC)
+
+# Leading slice parsed by estimate_compression_ratio
+ESTIMATE_SAMPLE_BYTES = 1 << 20
+ESTIMATE_SAMPLE_ROWS = 2000
+
+# Bytes per stored value for each residual_precision setting
+# (see codec.RESIDUAL_DTYPES)
+RESIDUAL_WIDTHS = {'fp32': 4, 'fp16': 2, 'int8': 1}
+
+
+class SempressCompressor:
+    """
+    Wrapper around Sempress compression library.
+    
+    numpy, pandas and sempress are imported on first use (via .codec), so
+    filter runs that pass every file through never load them.
+    """
+    
+    def __init__(self, config: Optional[Mapping[str, Any]] = None):
+        """
+        Initialize compressor with configuration.
+        
+        Args:
+            config: Configuration dictionary with compression settings
+        """
+        self.config = config or {}
+        self.lock_cols = list(self.config.get('lock_cols') or [])
+        self.residual_cols = list(self.config.get('residual_cols') or [])
+        self.k = self.config.get('k', 64)
+        self.uncertainty_threshold = self.config.get('uncertainty_threshold', 0.2)
+        self.auto_lock = self.config.get('auto_lock', True)
+        self.residual_precision = self.config.get('residual_precision', 'fp32')
+        if self.residual_precision not in RESIDUAL_WIDTHS:
+            logger.warning(f"Unknown residual_precision {self.residual_precision!r}, using fp32")
+            self.residual_precision = 'fp32'
+    
+    @cached_property
+    def _encode_cfg(self):
+        """Sempress configuration, built once: settings are fixed after __init__"""
+        from .codec import EncodeConfig
+        return EncodeConfig(
+            lock_cols=self.lock_cols,
+            residual_cols=self.residual_cols,
+            k=self.k,
+            uncertainty_thresh=self.uncertainty_threshold,
+            random_state=42
+        )
+    
+    def compress(self, csv_data: bytes) -> bytes:
+        """
+        Compress CSV data to .smp format.
+        
+        Args:
+            csv_data: Raw CSV file content as bytes
+            
+        Returns:
+            Compressed .smp file as bytes
+        """
+        from . import codec
+        from .csvio import read_csv_frame
+        
+        encode_config = self._encode_cfg
+        
+        # Compress with Sempress
+        logger.info(f"Compressing CSV with k={self.k}, lock_cols={self.lock_cols}")
+        if codec._fit_codebook is not None:
+            df = read_csv_frame(csv_data)
+            compressed_blob = codec.encode_frame(df, encode_config, self.residual_precision)
+        elif codec.decode_to_dataframe is not None:
+            # encode_csv hands its source straight to pandas.read_csv,
+            # so an in-memory buffer avoids the temp file round-trip
+            compressed_blob = codec.encode_csv(io.BytesIO(csv_data), encode_config)
+        else:
+            compressed_blob = self._compress_via_tempfile(csv_data, encode_config)
+        
+        # Calculate compression ratio
+        original_size = len(csv_data)
+        compressed_size = len(compressed_blob)
+        ratio = original_size / compressed_size if compressed_size > 0 else 0
+        
+        logger.info(f"Compression complete: {original_size} -> {compressed_size} bytes ({ratio:.2f}x)")
+        
+        return compressed_blob
+    
+    def compress_frame(self, df) -> bytes:
+        """
+        Compress an already-parsed table to .smp format.
+        
+        Lets callers holding typed data (Parquet, Excel, pixel tables)
+        skip rendering it as CSV text first.
+        
+        Args:
+            df: Table as a pandas DataFrame
+            
+        Returns:
+            Compressed .smp file as bytes
+        """
+        from . import codec
+        
+        if codec._fit_codebook is None:
+            # Sempress build without the frame-level pieces: go through CSV
+            buf = io.BytesIO()
+            df.to_csv(buf, index=False)
+            return self.compress(buf.getvalue())
+        
+        logger.info(f"Compressing table ({len(df)} rows) with k={self.k}, lock_cols={self.lock_cols}")
+        return codec.encode_frame(df, self._encode_cfg, self.residual_precision)
+    
+    def _compress_via_tempfile(self, csv_data: bytes, encode_config) -> bytes:
+        """Fallback for Sempress builds without in-memory support"""
+        from .codec import encode_csv
+        
+        # Write CSV to temporary file (Sempress needs file path)
+        with tempfile.NamedTemporaryFile(mode='wb', suffix='.csv', delete=False) as tmp:
+            tmp.write(csv_data)
+            tmp_path = tmp.name
+        
+        try:
+            return encode_csv(tmp_path, encode_config)
+        finally:
+            # Clean up temp file
+            Path(tmp_path).unlink(missing_ok=True)
+    
+    def decompress(self, smp_data: bytes) -> bytes:
+        """
+        Decompress .smp data back to CSV format.
+        
+        Args:
+            smp_data: Compressed .smp file content as bytes
+            
+        Returns:
+            Original CSV file as bytes
+        """
+        from . import codec
+        
+        logger.info(f"Decompressing .smp file ({len(smp_data)} bytes)")
+        
+        if codec.decode_to_dataframe is not None:
+            # Decode straight from memory and serialize into a buffer
+            df = codec.decode_frame(smp_data)
+            buf = io.BytesIO()
+            df.to_csv(buf, index=False)
+            csv_data = buf.getvalue()
+        else:
+            csv_data = self._decompress_via_tempfile(smp_data)
+        
+        logger.info(f"Decompression complete: {len(smp_data)} -> {len(csv_data)} bytes")
+        
+        return csv_data
+    
+    def decompress_frame(self, smp_data: bytes):
+        """
+        Decompress .smp data into a pandas DataFrame.
+        
+        Args:
+            smp_data: Compressed .smp file content as bytes
+            
+        Returns:
+            Reconstructed table as a DataFrame
+        """
+        import pandas as pd
+        from . import codec
+        
+        if codec.decode_to_dataframe is None:
+            return pd.read_csv(io.BytesIO(self._decompress_via_tempfile(smp_data)))
+        return codec.decode_frame(smp_data)
+    
+    def _decompress_via_tempfile(self, smp_data: bytes) -> bytes:
+        """Fallback for Sempress builds without in-memory support"""
+        from .codec import decode_to_csv
+        
+        if smp_data.startswith(SMP_RESIDUAL_MAGIC):
+            raise ValueError("Blob has fp16/int8 residuals, which this Sempress build cannot decode")
+        
+        # Write .smp to temporary file
+        with tempfile.NamedTemporaryFile(mode='wb', suffix='.smp', delete=False) as tmp_smp:
+            tmp_smp.write(smp_data)
+            smp_path = tmp_smp.name
+        
+        # Create temporary output path
+        csv_path = smp_path.replace('.smp', '_recon.csv')
+        
+        try:
+            decode_to_csv(smp_path, csv_path)
+            
+            # Read reconstructed CSV
+            with open(csv_path, 'rb') as f:
+                return f.read()
+            
+        finally:
+            # Clean up temp files
+            Path(smp_path).unlink(missing_ok=True)
+            Path(csv_path).unlink(missing_ok=True)
+    
+    def estimate_compression_ratio(self, csv_data: bytes) -> float:
+        """
+        Estimate compression ratio without full compression.
+        Parses a small leading sample and weighs each column by its text
+        width against its expected encoded size: numeric columns become
+        codebook indices (cheaper the fewer distinct values they hold),
+        text and locked columns are stored losslessly.
+        
+        Args:
+            csv_data: Raw CSV file content
+            
+        Returns:
+            Estimated compression ratio
+        """
+        import numpy as np
+        import pandas as pd
+        
+        # Copy just the sample out of a (possibly memoryview) buffer
+        sample = bytes(csv_data[:ESTIMATE_SAMPLE_BYTES])
+        if len(sample) < len(csv_data):
+            # Drop the trailing partial row
+            sample = sample[:sample.rfind(b'\n') + 1]
+        
+        try:
+            df = pd.read_csv(io.BytesIO(sample), nrows=ESTIMATE_SAMPLE_ROWS)
+        except Exception:
+            # Not parseable as CSV: Sempress can't do anything with it either
+            return 1.0
+        
+        if df.empty:
+            return 1.0
+        
+        index_bytes = 1 if self.k <= 256 else 2
+        text_bytes = 0.0
+        encoded_bytes = 0.0
+        
+        for col in df.columns:
+            values = df[col]
+            # Average CSV field width, including the separator
+            width = values.astype(str).str.len().mean() + 1
+            text_bytes += width
+            
+            if values.dtype.kind in 'iuf' and col not in self.lock_cols:
+                # Low-cardinality columns leave repetitive index streams
+                distinct = np.unique(values.to_numpy()).size / len(values)
+                encoded_bytes += index_bytes * (0.25 + 0.75 * distinct)
+                if col in self.residual_cols:
+                    # Residuals barely compress
+                    encoded_bytes += RESIDUAL_WIDTHS[self.residual_precision] * 0.8
+            else:
+                # Lossless columns end up zstd-compressed CSV text
+                encoded_bytes += width / 3
+        
+        return float(np.clip(text_bytes / encoded_bytes, 1.0, 20.0))
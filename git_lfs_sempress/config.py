@@ -2,27 +2,63 @@
 Configuration parser for .sempress.yml files.
 """
 
+import json
+import time
 import yaml
 from pathlib import Path
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional, Tuple
 import logging
 
 logger = logging.getLogger(__name__)
 
-DEFAULT_CONFIG = {
+try:
+    # libyaml-backed parser, 10-20x faster than the pure-Python one
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# Config file names in lookup order; JSON is parsed by CPython's C decoder
+CONFIG_FILENAMES = ('.sempress.json', '.sempress.yml')
+
+# Config discovery results, keyed by the directory the search started from,
+# with the directories searched and their mtimes. Adding or removing a
+# config file (or .git) changes its directory's mtime, invalidating the entry
+_FIND_CACHE: Dict[Path, Tuple[Optional[Path], Tuple[Path, ...], Tuple[int, ...]]] = {}
+
+# Directories modified this recently may change again within the same mtime
+# tick, so searches through them are not cached (cf. Git's "racy" index)
+RACY_MTIME_NS = 1_000_000_000
+
+# Parsed configs keyed by (path, mtime_ns): an edited file gets a fresh key
+_CONFIG_CACHE: Dict[Tuple[Path, int], Mapping[str, Any]] = {}
+
+# Read-only, so configs can share default sections instead of copying them
+DEFAULT_CONFIG = MappingProxyType({
     'version': 1,
-    'compression': {
+    'compression': MappingProxyType({
         'k': 64,
         'uncertainty_threshold': 0.2,
         'auto_lock': True,
-        'lock_cols': [],
-        'residual_cols': [],
-    },
-    'thresholds': {
+        'lock_cols': (),
+        'residual_cols': (),
+        'residual_precision': 'fp32',
+    }),
+    'thresholds': MappingProxyType({
         'min_size_mb': 1,
         'min_compression_ratio': 1.5,
-    },
-}
+    }),
+    'cache': MappingProxyType({
+        'enabled': True,
+        'max_size_mb': 1024,
+    }),
+    'process': MappingProxyType({
+        'workers': 0,
+    }),
+})
+
+# Sections merged key by key with the defaults instead of replaced wholesale
+CONFIG_SECTIONS = ('compression', 'thresholds', 'cache', 'process')
 
 DEFAULT_CONFIG_YAML = """version: 1
 
@@ -49,6 +85,9 @@ compression:
     - amount
     - price
     - balance
+  
+  # Storage width of residuals: fp32 (exact), fp16 or int8 (per-column scale)
+  residual_precision: fp32
 
 # File processing thresholds
 thresholds:
@@ -58,6 +97,18 @@ thresholds:
   # Skip compression if ratio is below this
   min_compression_ratio: 1.5
 
+# Reuse compressed output for content already seen (.git/sempress-cache)
+cache:
+  enabled: true
+  
+  # Least recently used entries are removed beyond this size (MB, 0 = no limit)
+  max_size_mb: 1024
+
+# Long-running filter process (git-lfs-sempress process)
+process:
+  # Parallel decompression workers for checkouts (0 = one per CPU, 1 = off)
+  workers: 0
+
 # Optional: S3 backup (Pro feature)
 # backup:
 #   enabled: false
@@ -66,6 +117,17 @@ thresholds:
 """
 
 
+def _mtimes(dirs) -> Tuple[int, ...]:
+    """Modification times of directories (-1 for ones that can't be stat'ed)"""
+    stamps = []
+    for d in dirs:
+        try:
+            stamps.append(d.stat().st_mtime_ns)
+        except OSError:
+            stamps.append(-1)
+    return tuple(stamps)
+
+
 class Config:
     """Configuration manager for Sempress LFS filter"""
     
@@ -80,88 +142,138 @@ class Config:
         self.config = self._load_config()
     
     def _find_config(self) -> Optional[Path]:
-        """Find .sempress.yml in current directory or parents"""
-        current = Path.cwd()
+        """Find .sempress.json/.sempress.yml in current directory or parents"""
+        start = Path.cwd()
+        cached = _FIND_CACHE.get(start)
+        if cached is not None:
+            found, searched, stamps = cached
+            if _mtimes(searched) == stamps:
+                return found
         
-        # Search up to 10 levels up
-        for _ in range(10):
-            config_file = current / '.sempress.yml'
-            if config_file.exists():
-                logger.info(f"Found config: {config_file}")
-                return config_file
-            
-            # Check if we're at git root
-            if (current / '.git').exists():
-                break
-            
-            parent = current.parent
-            if parent == current:
+        found = None
+        searched = []
+        stamps = []
+        # Search up to 10 levels up, stopping at the git root
+        for current in [start, *start.parents][:10]:
+            # Stamp before looking, so a change made mid-search invalidates
+            searched.append(current)
+            stamps.extend(_mtimes((current,)))
+            for name in CONFIG_FILENAMES:
+                config_file = current / name
+                if config_file.exists():
+                    logger.info(f"Found config: {config_file}")
+                    found = config_file
+                    break
+            if found or (current / '.git').exists():
                 break
-            current = parent
         
-        logger.warning("No .sempress.yml found, using defaults")
-        return None
+        if found is None:
+            logger.info("No .sempress.yml/.sempress.json found, using defaults")
+        if time.time_ns() - max(stamps) > RACY_MTIME_NS:
+            _FIND_CACHE[start] = (found, tuple(searched), tuple(stamps))
+        else:
+            _FIND_CACHE.pop(start, None)
+        return found
     
-    def _load_config(self) -> Dict[str, Any]:
+    def _load_config(self) -> Mapping[str, Any]:
         """Load and parse configuration file"""
-        if not self.config_path or not self.config_path.exists():
-            return DEFAULT_CONFIG.copy()
+        if not self.config_path:
+            return DEFAULT_CONFIG
+        
+        try:
+            cache_key = (self.config_path, self.config_path.stat().st_mtime_ns)
+        except OSError:
+            return DEFAULT_CONFIG
+        
+        if cache_key in _CONFIG_CACHE:
+            return _CONFIG_CACHE[cache_key]
         
         try:
             with open(self.config_path, 'r') as f:
-                user_config = yaml.safe_load(f) or {}
-            
-            # Merge with defaults (user config overrides)
-            config = DEFAULT_CONFIG.copy()
-            config.update(user_config)
+                if self.config_path.suffix == '.json':
+                    user_config = json.load(f) or {}
+                else:
+                    user_config = yaml.load(f, Loader=_YamlLoader) or {}
             
-            # Merge nested dicts
-            if 'compression' in user_config:
-                config['compression'].update(user_config['compression'])
-            if 'thresholds' in user_config:
-                config['thresholds'].update(user_config['thresholds'])
+            # Merge with defaults (user config overrides). Sections the user
+            # didn't set are shared with DEFAULT_CONFIG, which is read-only
+            config = {**DEFAULT_CONFIG, **user_config}
+            for section in CONFIG_SECTIONS:
+                if user_config.get(section):
+                    config[section] = MappingProxyType({**DEFAULT_CONFIG[section], **user_config[section]})
+                else:
+                    config[section] = DEFAULT_CONFIG[section]
+            config = MappingProxyType(config)
             
             logger.info(f"Loaded config from {self.config_path}")
+            _CONFIG_CACHE[cache_key] = config
             return config
             
         except Exception as e:
             logger.error(f"Failed to load config: {e}")
-            return DEFAULT_CONFIG.copy()
+            return DEFAULT_CONFIG
     
-    def get_compression_config(self) -> Dict[str, Any]:
+    def get_compression_config(self) -> Mapping[str, Any]:
         """Get compression settings"""
         return self.config.get('compression', {})
     
-    def get_thresholds(self) -> Dict[str, Any]:
+    def get_thresholds(self) -> Mapping[str, Any]:
         """Get file processing thresholds"""
         return self.config.get('thresholds', {})
     
-    def should_compress(self, file_size_bytes: int, estimated_ratio: float) -> bool:
+    def get_cache_config(self) -> Mapping[str, Any]:
+        """Get compressed-output cache settings"""
+        return self.config.get('cache', {})
+    
+    def get_process_config(self) -> Mapping[str, Any]:
+        """Get long-running filter process settings"""
+        return self.config.get('process', {})
+    
+    def is_large_enough(self, file_size_bytes: int) -> bool:
         """
-        Determine if a file should be compressed based on thresholds.
+        Check a file against the minimum size threshold.
         
         Args:
             file_size_bytes: Size of the file in bytes
-            estimated_ratio: Estimated compression ratio
             
         Returns:
-            True if file should be compressed
+            True if the file is at least min_size_mb
         """
-        thresholds = self.get_thresholds()
-        
-        # Check minimum file size
-        min_size_mb = thresholds.get('min_size_mb', 1)
+        min_size_mb = self.get_thresholds().get('min_size_mb', 1)
         size_mb = file_size_bytes / (1024 * 1024)
         if size_mb < min_size_mb:
             logger.info(f"File too small ({size_mb:.2f} MB < {min_size_mb} MB), skipping compression")
             return False
+        return True
+    
+    def should_compress(self, file_size_bytes: int, estimated_ratio: float) -> bool:
+        """
+        Determine if a file should be compressed based on thresholds.
+        
+        Args:
+            file_size_bytes: Size of the file in bytes
+            estimated_ratio: Estimated compression ratio
+            
+        Returns:
+            True if file should be compressed
+        """
+        # Check minimum file size, then minimum compression ratio
+        return self.is_large_enough(file_size_bytes) and self.has_good_ratio(estimated_ratio)
+    
+    def has_good_ratio(self, estimated_ratio: float) -> bool:
+        """
+        Check an estimated ratio against the minimum compression ratio.
         
-        # Check minimum compression ratio
-        min_ratio = thresholds.get('min_compression_ratio', 1.5)
+        Args:
+            estimated_ratio: Estimated compression ratio
+            
+        Returns:
+            True if the ratio is at least min_compression_ratio
+        """
+        min_ratio = self.get_thresholds().get('min_compression_ratio', 1.5)
         if estimated_ratio < min_ratio:
             logger.info(f"Compression ratio too low ({estimated_ratio:.2f}x < {min_ratio}x), skipping")
             return False
-        
         return True
     
     @staticmethod
@@ -0,0 +1,271 @@
+"""
+CSV parsing shared by the codec, format conversion and quality checks.
+Uses pyarrow's multi-threaded reader when it is installed, typed the way
+pandas.read_csv would type the same text.
+"""
+
+import io
+import re
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+import logging
+import pandas as pd
+
+try:
+    # Multi-threaded CSV parser, several times faster than pandas' on large files
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+except ImportError:
+    pacsv = None
+
+logger = logging.getLogger(__name__)
+
+# pandas.read_csv's default missing-value and boolean spellings, handed to
+# pyarrow so both parsers type the same text the same way
+CSV_NULL_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+    '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+    'n/a', 'nan', 'null',
+]
+CSV_TRUE_VALUES = ['True', 'TRUE', 'true']
+CSV_FALSE_VALUES = ['False', 'FALSE', 'false']
+
+# pyarrow turns integers outside int64 into doubles; pandas makes them
+# uint64, object or str depending on the rest of the column
+INT64_LIMIT = 2 ** 63
+
+# Window for byte scans over the raw text (see _contains)
+SCAN_WINDOW_BYTES = 1 << 26
+
+# Column types iter_csv_frames can be told to use, as pd.read_csv dtypes
+ARROW_DTYPES = {str: 'string', float: 'float64'}
+
+
+class ColumnTypeError(ValueError):
+    """
+    A streamed column holds values its type, inferred from the start of the
+    file, cannot represent.
+    
+    Attributes:
+        column: Name of the column
+        dtype: Wider type (float or str) to read it as instead
+    """
+    
+    def __init__(self, column: str, dtype: type, message: str):
+        super().__init__(message)
+        self.column = column
+        self.dtype = dtype
+
+
+def _convert_options(column_types=None, include_columns=None):
+    """pyarrow conversion options matching pandas.read_csv's defaults"""
+    options = pacsv.ConvertOptions(
+        null_values=CSV_NULL_VALUES,
+        true_values=CSV_TRUE_VALUES,
+        false_values=CSV_FALSE_VALUES,
+        strings_can_be_null=True,
+    )
+    if column_types:
+        options.column_types = column_types
+    if include_columns:
+        options.include_columns = include_columns
+    return options
+
+
+def _type_overrides(schema) -> dict:
+    """Types for columns pyarrow would parse as dates/times (text) or null (float)"""
+    overrides = {}
+    for field in schema:
+        if pa.types.is_temporal(field.type):
+            overrides[field.name] = pa.string()
+        elif pa.types.is_null(field.type):
+            overrides[field.name] = pa.float64()
+    return overrides
+
+
+def _contains(csv_data, needles) -> bool:
+    """Whether any of the byte strings occurs in the raw text"""
+    view = memoryview(csv_data).cast('B')
+    overlap = max(len(n) for n in needles) - 1
+    for start in range(0, len(view), SCAN_WINDOW_BYTES):
+        window = bytes(view[start:start + SCAN_WINDOW_BYTES + overlap])
+        if any(n in window for n in needles):
+            return True
+    return False
+
+
+def _hex_columns(csv_data, table) -> List[str]:
+    """
+    Integer columns holding 0x-prefixed text.
+    
+    pyarrow parses hex literals as integers where pandas keeps the column
+    as text. Only files containing '0x' at all pay for the string re-read.
+    """
+    int_cols = [f.name for f in table.schema if pa.types.is_integer(f.type)]
+    if not int_cols or not _contains(csv_data, (b'0x', b'0X')):
+        return []
+    
+    text = pacsv.read_csv(
+        pa.BufferReader(csv_data),
+        convert_options=_convert_options({c: pa.string() for c in int_cols}, int_cols),
+    )
+    return [c for c in int_cols
+            if pc.any(pc.match_substring_regex(text[c], r'^\s*"?\s*[-+]?0[xX]')).as_py()]
+
+
+def _pandas_typed_columns(csv_data, table) -> List[str]:
+    """
+    Float columns pandas would type differently.
+    
+    pyarrow reads integers beyond int64 and '+'-signed integers as doubles;
+    pandas gives uint64/object/str for the former and int64 for the latter.
+    """
+    plus = None
+    columns = []
+    for field in table.schema:
+        if not pa.types.is_floating(field.type):
+            continue
+        column = table[field.name]
+        peak = pc.max(pc.abs(column)).as_py()
+        if peak is not None and peak >= INT64_LIMIT:
+            columns.append(field.name)
+            continue
+        # All-integral doubles without gaps may have been written as +1, +2, ...
+        if column.null_count == 0 and len(column) and pc.all(pc.equal(pc.floor(column), column)).as_py():
+            if plus is None:
+                plus = _contains(csv_data, (b'+',))
+            if plus:
+                columns.append(field.name)
+    return columns
+
+
+def read_csv_frame(csv_data: bytes) -> pd.DataFrame:
+    """
+    Parse CSV content into a DataFrame, with pyarrow when it is installed.
+    
+    The result is typed like pandas.read_csv's: columns pyarrow would parse
+    as dates/times or hex integers stay text, all-empty columns become float
+    NaN, and float columns whose text pandas reads as integers (beyond int64,
+    or '+'-signed) are taken from pandas. Input pyarrow rejects, or whose
+    header repeats a name, goes to pandas, as do header-only files.
+    
+    Args:
+        csv_data: Raw CSV file content (any bytes-like object)
+        
+    Returns:
+        Parsed DataFrame
+    """
+    if pacsv is not None:
+        try:
+            # BufferReader wraps the caller's buffer without copying it
+            table = pacsv.read_csv(pa.BufferReader(csv_data), convert_options=_convert_options())
+            
+            overrides = _type_overrides(table.schema)
+            for name in _hex_columns(csv_data, table):
+                overrides[name] = pa.string()
+            pandas_cols = _pandas_typed_columns(csv_data, table)
+            if overrides:
+                # Rare: re-parse with those columns typed explicitly
+                table = pacsv.read_csv(pa.BufferReader(csv_data), convert_options=_convert_options(overrides))
+            
+            # Header-only files are left to pandas, which types them object
+            if table.num_rows and len(set(table.column_names)) == table.num_columns:
+                df = table.to_pandas(split_blocks=True, self_destruct=True)
+                if pandas_cols:
+                    # Rarer still: let pandas type just those columns
+                    typed = pd.read_csv(io.BytesIO(csv_data), usecols=pandas_cols)
+                    for name in pandas_cols:
+                        df[name] = typed[name]
+                return df
+        except pa.ArrowInvalid as e:
+            logger.debug(f"pyarrow could not parse CSV, using pandas: {e}")
+    
+    return pd.read_csv(io.BytesIO(csv_data))
+
+
+def read_csv_path(path: Union[str, Path]) -> pd.DataFrame:
+    """
+    Parse a CSV file with read_csv_frame.
+    
+    The file is memory-mapped rather than read into a private copy, so its
+    pages come straight from the page cache and are loaded on demand.
+    """
+    if pacsv is None:
+        return pd.read_csv(path, memory_map=True)
+    
+    with pa.memory_map(str(path)) as source:
+        return read_csv_frame(source.read_buffer())
+
+
+def _column_type_error(error, schema) -> Optional[ColumnTypeError]:
+    """ColumnTypeError for a pyarrow conversion error, or None for other errors"""
+    match = re.match(r'In CSV column #(\d+):', str(error))
+    if match is None:
+        return None
+    field = schema.field(int(match.group(1)))
+    # Integers and all-empty columns can still be numbers; anything else is text
+    numeric = pa.types.is_integer(field.type) or pa.types.is_null(field.type)
+    return ColumnTypeError(field.name, float if numeric else str, str(error))
+
+
+def iter_csv_frames(path: Union[str, Path], chunk_rows: int,
+                    dtype: Optional[Dict[str, type]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream a CSV file as DataFrames of chunk_rows rows (the last may be shorter).
+    
+    pyarrow's streaming reader infers column types from the first block of
+    the file, typed like read_csv_frame, and raises ColumnTypeError when a
+    later block does not fit; the caller can start over with that column
+    in dtype. Unlike read_csv_frame, hex and beyond-int64 integers are not
+    retyped, which would take a pass over the whole file first.
+    
+    Args:
+        path: CSV file
+        chunk_rows: Rows per DataFrame
+        dtype: Column types to use instead of inferred ones (str or float),
+            as pd.read_csv's dtype argument
+        
+    Yields:
+        DataFrames of consecutive rows
+    """
+    if pacsv is None:
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=dtype)
+        return
+    
+    forced = {name: ARROW_DTYPES[t] for name, t in (dtype or {}).items()}
+    reader = pacsv.open_csv(str(path), convert_options=_convert_options(forced))
+    overrides = _type_overrides(reader.schema)
+    if overrides:
+        overrides.update(forced)
+        reader = pacsv.open_csv(str(path), convert_options=_convert_options(overrides))
+    schema = reader.schema
+    if len(set(schema.names)) != len(schema):
+        # pandas renames repeated header names (a, a.1, ...); let it
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=dtype)
+        return
+    
+    # Record batches follow pyarrow's block size; regroup them into
+    # chunk_rows-row tables (slices share the batches' buffers)
+    pending = []
+    rows = 0
+    while True:
+        try:
+            batch = reader.read_next_batch()
+        except StopIteration:
+            break
+        except pa.ArrowInvalid as e:
+            error = _column_type_error(e, schema)
+            if error is None:
+                raise
+            raise error from e
+        pending.append(batch)
+        rows += batch.num_rows
+        while rows >= chunk_rows:
+            table = pa.Table.from_batches(pending, schema)
+            yield table.slice(0, chunk_rows).to_pandas(split_blocks=True)
+            rest = table.slice(chunk_rows)
+            pending = rest.to_batches()
+            rows = rest.num_rows
+    if rows:
+        yield pa.Table.from_batches(pending, schema).to_pandas(split_blocks=True)
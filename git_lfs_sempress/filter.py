@@ -3,16 +3,38 @@ Git LFS filter implementation (clean/smudge protocol).
 This is the core of the Sempress LFS plugin.
 """
 
+import io
+import os
 import sys
 import logging
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import cached_property
 from pathlib import Path
-from typing import Optional
+from typing import Optional, List, Dict, Tuple
 
-from .compression import SempressCompressor
+try:
+    # SIMD-accelerated, several times faster than SHA-256 without SHA-NI
+    from blake3 import blake3 as _content_hash
+except ImportError:
+    from hashlib import sha256 as _content_hash
+
+from .compression import SempressCompressor, SMP_MAGIC, SMP_MAGICS, ESTIMATE_SAMPLE_BYTES
 from .config import Config
 
 logger = logging.getLogger(__name__)
 
+# pkt-line framing for Git's long-running filter protocol (gitprotocol-common)
+PKT_FLUSH = b'0000'
+PKT_DELIM = b'0001'
+MAX_PKT_DATA = 65516
+
+# Pipe buffer/chunk size for stdin/stdout. In the filter process, responses
+# are flushed once per terminating flush packet rather than once per pkt-line
+PIPE_BUFFER_SIZE = 1 << 20
+
 
 class SempressFilter:
     """Git LFS clean/smudge filter for Sempress compression"""
@@ -27,107 +49,410 @@ class SempressFilter:
         self.config = config or Config()
         self.compressor = SempressCompressor(self.config.get_compression_config())
     
-    def clean(self, input_stream=None, filename: Optional[str] = None) -> bytes:
+    @cached_property
+    def cache_dir(self) -> Optional[Path]:
+        """Compressed-output cache directory (.git/sempress-cache), or None"""
+        try:
+            result = subprocess.run(
+                ['git', 'rev-parse', '--git-common-dir'],
+                capture_output=True,
+                text=True
+            )
+        except OSError:
+            return None
+        if result.returncode != 0:
+            return None
+        
+        cache_dir = Path(result.stdout.strip()).resolve() / 'sempress-cache'
+        try:
+            cache_dir.mkdir(exist_ok=True)
+        except OSError as e:
+            logger.warning(f"Cache disabled, cannot create {cache_dir}: {e}")
+            return None
+        return cache_dir
+    
+    def _new_content_hasher(self):
+        """Start a content hash for the cache key, or None if caching is off"""
+        if not self.config.get_cache_config().get('enabled', True):
+            return None
+        hasher = _content_hash()
+        # The same CSV under different settings compresses differently
+        hasher.update(repr(sorted(self.config.get_compression_config().items())).encode('utf-8'))
+        return hasher
+    
+    def _cache_path(self, hasher) -> Optional[Path]:
+        """Cache entry for the hashed content, or None if caching is unavailable"""
+        if hasher is None or self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{hasher.hexdigest()}.smp"
+    
+    @staticmethod
+    def _store_cache(cache_path: Optional[Path], data: bytes):
+        """Atomically add a compressed blob to the cache (best effort)"""
+        if cache_path is None:
+            return
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(dir=cache_path.parent, suffix='.tmp', delete=False) as tmp:
+                tmp_path = tmp.name
+                tmp.write(data)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry: {e}")
+            if tmp_path:
+                Path(tmp_path).unlink(missing_ok=True)
+    
+    def _prune_cache(self):
+        """Trim the cache to cache.max_size_mb after adding an entry"""
+        max_mb = self.config.get_cache_config().get('max_size_mb', 0)
+        if not max_mb or self.cache_dir is None:
+            return
+        try:
+            removed, freed = prune_cache(self.cache_dir, int(max_mb * 1024 * 1024))
+        except OSError as e:
+            logger.warning(f"Could not prune cache: {e}")
+            return
+        if removed:
+            logger.info(f"Pruned {removed} cache entries ({freed} bytes)")
+    
+    def _should_compress_fast(self, head: bytes, size: Optional[int], complete: bool) -> bool:
+        """
+        Decide from the leading sample, before the whole input is buffered.
+        
+        The ratio estimate only ever looks at the first ESTIMATE_SAMPLE_BYTES,
+        so every threshold except an unknown total size is checked here.
+        
+        Args:
+            head: Leading sample of the input
+            size: Exact total input size, if known up front
+            complete: Whether head is the entire input
+            
+        Returns:
+            False if the input can be passed through without a closer look
+        """
+        if head.startswith(SMP_MAGICS):
+            logger.info("Input is already Sempress-compressed")
+            return False
+        
+        if b'\x00' in head:
+            logger.info("Input looks binary, not CSV")
+            return False
+        
+        if size is not None and not self.config.is_large_enough(size):
+            return False
+        
+        # Estimate on whole rows only
+        sample = head if complete else head[:head.rfind(b'\n') + 1]
+        if not self.config.has_good_ratio(self.compressor.estimate_compression_ratio(sample)):
+            return False
+        
+        return True
+    
+    def clean(self, input_stream=None, filename: Optional[str] = None, output_stream=None,
+              size: Optional[int] = None):
         """
         Clean filter: compress CSV -> .smp for Git LFS storage.
         Called when staging files (git add).
         
+        Writes compressed .smp data (or the original if compression is
+        skipped) to the output stream. Input rejected on its leading
+        sample is streamed through without being buffered in full.
+        
         Args:
             input_stream: Input stream (stdin by default)
             filename: Name of the file being processed
-            
-        Returns:
-            Compressed .smp data (or original if compression skipped)
+            output_stream: Output stream (stdout by default)
+            size: Exact input length, if the caller knows it
         """
         input_stream = input_stream or sys.stdin.buffer
+        output_stream = output_stream or sys.stdout.buffer
         
         try:
-            # Read CSV data from stdin
-            csv_data = input_stream.read()
+            # Peek at the leading sample before committing to read everything
+            head = _read_head(input_stream, ESTIMATE_SAMPLE_BYTES)
             
-            if not csv_data:
+            if not head:
                 logger.warning("Empty input data")
-                return b''
+                return
             
-            logger.info(f"Clean filter: processing {len(csv_data)} bytes" + 
-                       (f" from {filename}" if filename else ""))
+            # A short head means EOF: the input size is then known exactly
+            complete = len(head) < ESTIMATE_SAMPLE_BYTES
+            if complete:
+                size = len(head)
+            if not self._should_compress_fast(head, size, complete):
+                logger.info("Skipping compression, passing through")
+                _write_stream(output_stream, head)
+                shutil.copyfileobj(input_stream, output_stream, PIPE_BUFFER_SIZE)
+                return
             
-            # Estimate compression ratio
-            estimated_ratio = self.compressor.estimate_compression_ratio(csv_data)
+            # Read the rest of the CSV, hashing it for the cache as it streams in
+            # Git may be cleaning content other than the working-tree file
+            # (git add -p, the index, another revision), so that file's size
+            # only sizes the read buffer; _clean_data checks the bytes read
+            hasher = self._new_content_hasher()
+            size_hint = size if size is not None else _file_size_hint(filename)
+            csv_data = _read_stream(input_stream, hasher, head, size_hint)
             
-            # Check if we should compress
-            if not self.config.should_compress(len(csv_data), estimated_ratio):
-                logger.info("Skipping compression (below thresholds)")
-                return csv_data
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"Clean filter: processing {len(csv_data)} bytes" + 
+                           (f" from {filename}" if filename else ""))
             
-            # Compress with Sempress
-            try:
-                compressed_data = self.compressor.compress(csv_data)
-                
-                # Verify compression is beneficial
-                actual_ratio = len(csv_data) / len(compressed_data)
-                if actual_ratio < self.config.get_thresholds().get('min_compression_ratio', 1.5):
-                    logger.warning(f"Actual compression ratio too low ({actual_ratio:.2f}x), using original")
-                    return csv_data
-                
-                logger.info(f"OK: Compressed: {len(csv_data)} -> {len(compressed_data)} bytes ({actual_ratio:.2f}x)")
-                return compressed_data
-                
-            except Exception as e:
-                logger.error(f"Compression failed: {e}", exc_info=True)
-                logger.warning("Falling back to original file")
-                return csv_data
+            _write_stream(output_stream, self._clean_data(csv_data, hasher))
         
         except Exception as e:
             logger.error(f"Clean filter error: {e}", exc_info=True)
-            return b''
     
-    def smudge(self, input_stream=None, filename: Optional[str] = None) -> bytes:
+    def _clean_data(self, csv_data: bytes, hasher=None) -> bytes:
+        """
+        Compress a fully-read CSV that passed _should_compress_fast.
+        
+        Args:
+            csv_data: Raw CSV file content
+            hasher: Content hash of csv_data for the cache, or None
+            
+        Returns:
+            Compressed .smp data (or original if compression skipped)
+        """
+        # Only the size may still be unchecked (no exact size up front)
+        if not self.config.is_large_enough(len(csv_data)):
+            logger.info("Skipping compression (below thresholds)")
+            return csv_data
+        
+        # Reuse the blob from an earlier clean of identical content
+        cache_path = self._cache_path(hasher)
+        if cache_path is not None:
+            try:
+                cached = cache_path.read_bytes()
+                # Pruning drops the least recently used entries by mtime
+                os.utime(cache_path)
+            except OSError:
+                cached = None
+            if cached is not None:
+                logger.info(f"OK: Cache hit, reusing {cache_path.name}")
+                return cached
+        
+        # Compress with Sempress
+        try:
+            compressed_data = self.compressor.compress(csv_data)
+            
+            # Verify compression is beneficial
+            actual_ratio = len(csv_data) / len(compressed_data)
+            if actual_ratio < self.config.get_thresholds().get('min_compression_ratio', 1.5):
+                logger.warning(f"Actual compression ratio too low ({actual_ratio:.2f}x), using original")
+                return csv_data
+            
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"OK: Compressed: {len(csv_data)} -> {len(compressed_data)} bytes ({actual_ratio:.2f}x)")
+            if cache_path is not None:
+                self._store_cache(cache_path, compressed_data)
+                self._prune_cache()
+            return compressed_data
+            
+        except Exception as e:
+            logger.error(f"Compression failed: {e}", exc_info=True)
+            logger.warning("Falling back to original file")
+            return csv_data
+    
+    def smudge(self, input_stream=None, filename: Optional[str] = None, output_stream=None):
         """
         Smudge filter: decompress .smp -> CSV for working tree.
         Called when checking out files (git checkout).
         
+        Writes decompressed CSV data (or the original if not compressed)
+        to the output stream.
+        
         Args:
             input_stream: Input stream (stdin by default)
             filename: Name of the file being processed
-            
-        Returns:
-            Decompressed CSV data (or original if not compressed)
+            output_stream: Output stream (stdout by default)
         """
         input_stream = input_stream or sys.stdin.buffer
+        output_stream = output_stream or sys.stdout.buffer
         
         try:
             # Read data from stdin
-            input_data = input_stream.read()
+            input_data = _read_stream(input_stream)
             
             if not input_data:
                 logger.warning("Empty input data")
-                return b''
+                return
             
-            logger.info(f"Smudge filter: processing {len(input_data)} bytes" +
-                       (f" for {filename}" if filename else ""))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"Smudge filter: processing {len(input_data)} bytes" +
+                           (f" for {filename}" if filename else ""))
             
-            # Check if data is compressed (simple heuristic: check for .smp header)
-            # Sempress .smp files start with msgpack data
-            # If it looks like CSV text, it's not compressed
-            if input_data[:100].decode('utf-8', errors='ignore').count(',') > 5:
-                logger.info("Data appears to be uncompressed CSV, passing through")
-                return input_data
-            
-            # Try to decompress
-            try:
-                csv_data = self.compressor.decompress(input_data)
-                logger.info(f"OK: Decompressed: {len(input_data)} -> {len(csv_data)} bytes")
-                return csv_data
-                
-            except Exception as e:
-                logger.error(f"Decompression failed: {e}", exc_info=True)
-                logger.warning("Data may not be compressed, passing through")
-                return input_data
+            _write_stream(output_stream, self._smudge_data(input_data))
         
         except Exception as e:
             logger.error(f"Smudge filter error: {e}", exc_info=True)
-            return b''
+    
+    def _smudge_data(self, input_data: bytes) -> bytes:
+        """
+        Decompress a fully-read blob if it is Sempress-compressed.
+        
+        Args:
+            input_data: Blob content from Git
+            
+        Returns:
+            Decompressed CSV data (or original if not compressed)
+        """
+        # Check if data is compressed: .smp files start with the Sempress
+        # container header, anything else was stored uncompressed
+        if bytes(input_data[:len(SMP_MAGIC)]) not in SMP_MAGICS:
+            logger.info("Data is not Sempress-compressed, passing through")
+            return input_data
+        
+        # Try to decompress
+        try:
+            # The container parser needs real bytes; compressed blobs are small
+            csv_data = self.compressor.decompress(bytes(input_data))
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"OK: Decompressed: {len(input_data)} -> {len(csv_data)} bytes")
+            return csv_data
+            
+        except Exception as e:
+            logger.error(f"Decompression failed: {e}", exc_info=True)
+            logger.warning("Data may not be compressed, passing through")
+            return input_data
+
+
+def _read_into(readinto, hasher=None, head: bytes = b'', size_hint: Optional[int] = None) -> memoryview:
+    """
+    Read to EOF into one preallocated buffer and return a view of the data.
+    
+    The buffer is sized from size_hint plus one chunk of slack, so an exact
+    hint never reallocates, and doubles when outgrown. Chunks land in place
+    via readinto, so the data is copied once: from the pipe into the buffer.
+    """
+    n = len(head)
+    buf = bytearray(max(size_hint or 0, n) + PIPE_BUFFER_SIZE)
+    buf[:n] = head
+    while True:
+        if len(buf) - n < PIPE_BUFFER_SIZE:
+            buf += bytes(len(buf))
+        # Views are temporaries: an outstanding export would block resizing
+        got = readinto(memoryview(buf)[n:n + PIPE_BUFFER_SIZE])
+        if not got:
+            return memoryview(buf)[:n]
+        if hasher is not None:
+            hasher.update(memoryview(buf)[n:n + got])
+        n += got
+
+
+def _write_all_fast(fd: int, data: bytes):
+    """Write all of data to a file descriptor with large os.write() calls"""
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view[:PIPE_BUFFER_SIZE])
+        view = view[written:]
+
+
+def _read_chunk(stream, size: int = PIPE_BUFFER_SIZE) -> bytes:
+    """Read up to one chunk, bypassing Python's io layer for real file descriptors"""
+    try:
+        fd = stream.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return stream.read(size)
+    return os.read(fd, size)
+
+
+def _read_head(stream, size: int) -> bytes:
+    """Read size bytes, or fewer only at EOF (pipes return short reads)"""
+    head = _read_chunk(stream, size)
+    if len(head) == size or not head:
+        return head
+    
+    buf = bytearray(head)
+    while len(buf) < size:
+        chunk = _read_chunk(stream, size - len(buf))
+        if not chunk:
+            break
+        buf += chunk
+    return bytes(buf)
+
+
+def _read_stream(stream, hasher=None, head: bytes = b'', size_hint: Optional[int] = None) -> memoryview:
+    """
+    Read a whole stream, bypassing Python's io layer for real file descriptors.
+    
+    Args:
+        stream: Binary input stream
+        hasher: Optional hashlib-style object fed with the data as it is read
+        head: Data already read from the stream, to prepend
+        size_hint: Expected total size, used to preallocate the buffer
+        
+    Returns:
+        Zero-copy view of the data read
+    """
+    if hasher is not None:
+        hasher.update(head)
+    try:
+        fd = stream.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return _read_into(stream.readinto, hasher, head, size_hint)
+    with io.FileIO(fd, 'rb', closefd=False) as raw:
+        return _read_into(raw.readinto, hasher, head, size_hint)
+
+
+def _write_stream(stream, data: bytes):
+    """Write data, bypassing Python's io layer for real file descriptors"""
+    try:
+        fd = stream.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        stream.write(data)
+        return
+    stream.flush()
+    _write_all_fast(fd, data)
+
+
+def prune_cache(cache_dir: Path, max_bytes: int) -> Tuple[int, int]:
+    """
+    Remove least recently used cache entries until the rest fit in max_bytes.
+    
+    Entries are touched on every cache hit, so mtime order is use order.
+    
+    Args:
+        cache_dir: Cache directory (.git/sempress-cache)
+        max_bytes: Size to trim the cache to (0 empties it)
+        
+    Returns:
+        (entries removed, bytes freed)
+    """
+    entries = []
+    total = 0
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if not entry.name.endswith('.smp'):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, entry.path))
+            total += st.st_size
+    
+    removed = 0
+    freed = 0
+    for _, size, path in sorted(entries):
+        if total - freed <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        removed += 1
+        freed += size
+    return removed, freed
+
+
+def _file_size_hint(filename: Optional[str]) -> Optional[int]:
+    """Working-tree size of the file being cleaned, if Git passed its path"""
+    if not filename:
+        return None
+    try:
+        return os.stat(filename).st_size
+    except OSError:
+        return None
 
 
 def run_clean_filter(filename: Optional[str] = None):
@@ -135,17 +460,9 @@ def run_clean_filter(filename: Optional[str] = None):
     Entry point for clean filter.
     Called by Git: git-lfs-sempress clean %f
     """
-    # Set up logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='[sempress-clean] %(message)s',
-        handlers=[logging.StreamHandler(sys.stderr)]
-    )
-    
     try:
         filter_obj = SempressFilter()
-        compressed_data = filter_obj.clean(filename=filename)
-        sys.stdout.buffer.write(compressed_data)
+        filter_obj.clean(filename=filename)
         sys.stdout.buffer.flush()
     except Exception as e:
         logger.error(f"Clean filter fatal error: {e}", exc_info=True)
@@ -157,18 +474,245 @@ def run_smudge_filter(filename: Optional[str] = None):
     Entry point for smudge filter.
     Called by Git: git-lfs-sempress smudge %f
     """
-    # Set up logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='[sempress-smudge] %(message)s',
-        handlers=[logging.StreamHandler(sys.stderr)]
-    )
-    
     try:
         filter_obj = SempressFilter()
-        csv_data = filter_obj.smudge(filename=filename)
-        sys.stdout.buffer.write(csv_data)
+        filter_obj.smudge(filename=filename)
         sys.stdout.buffer.flush()
     except Exception as e:
         logger.error(f"Smudge filter fatal error: {e}", exc_info=True)
         sys.exit(1)
+
+
+def _read_pkt(stream) -> Optional[bytes]:
+    """
+    Read a single pkt-line from the stream.
+    
+    Returns:
+        Packet payload, or None for a flush/delim packet
+    """
+    header = stream.read(4)
+    if not header:
+        raise EOFError("Filter stream closed")
+    if len(header) != 4:
+        raise ValueError(f"Truncated pkt-line header: {header!r}")
+    
+    length = int(header, 16)
+    if length < 4:
+        # 0000 (flush) and 0001 (delim) carry no payload
+        return None
+    
+    payload = stream.read(length - 4)
+    if len(payload) != length - 4:
+        raise ValueError(f"Truncated pkt-line: expected {length - 4} bytes, got {len(payload)}")
+    return payload
+
+
+def _read_pkt_list(stream) -> List[str]:
+    """Read text pkt-lines up to the next flush packet"""
+    lines = []
+    while True:
+        payload = _read_pkt(stream)
+        if payload is None:
+            return lines
+        lines.append(payload.decode('utf-8').rstrip('\n'))
+
+
+def _read_pkt_content(stream) -> bytes:
+    """Read binary content pkt-lines up to the next flush packet"""
+    chunks = []
+    while True:
+        payload = _read_pkt(stream)
+        if payload is None:
+            return b''.join(chunks)
+        chunks.append(payload)
+
+
+def _write_pkt(stream, payload: bytes):
+    """Write a single pkt-line (buffered; the caller flushes per response)"""
+    stream.write(b'%04x' % (len(payload) + 4))
+    stream.write(payload)
+
+
+def _write_pkt_text(stream, text: str):
+    """Write a text pkt-line (LF-terminated)"""
+    _write_pkt(stream, (text + '\n').encode('utf-8'))
+
+
+def _write_pkt_content(stream, data: bytes):
+    """Write binary content split into maximum-size pkt-lines, then flush"""
+    view = memoryview(data)
+    for start in range(0, len(view), MAX_PKT_DATA):
+        _write_pkt(stream, view[start:start + MAX_PKT_DATA])
+    stream.write(PKT_FLUSH)
+
+
+def _handshake(input_stream, output_stream, offered=('clean', 'smudge')) -> List[str]:
+    """
+    Negotiate protocol version and capabilities with Git.
+    
+    See "Long Running Filter Process" in gitattributes(5).
+    
+    Returns:
+        Capabilities supported by both sides
+    """
+    welcome = _read_pkt_list(input_stream)
+    if not welcome or welcome[0] != 'git-filter-client' or 'version=2' not in welcome[1:]:
+        raise ValueError(f"Unsupported filter protocol handshake: {welcome}")
+    
+    _write_pkt_text(output_stream, 'git-filter-server')
+    _write_pkt_text(output_stream, 'version=2')
+    output_stream.write(PKT_FLUSH)
+    output_stream.flush()
+    
+    requested = _read_pkt_list(input_stream)
+    capabilities = [c for c in offered if f'capability={c}' in requested]
+    for capability in capabilities:
+        _write_pkt_text(output_stream, f'capability={capability}')
+    output_stream.write(PKT_FLUSH)
+    output_stream.flush()
+    return capabilities
+
+
+def _parse_headers(lines: List[str]) -> Dict[str, str]:
+    """Parse key=value pkt-lines into a dict"""
+    headers = {}
+    for line in lines:
+        key, _, value = line.partition('=')
+        headers[key] = value
+    return headers
+
+
+def _write_status(output_stream, status: str):
+    """Write a status-only response and flush it"""
+    _write_pkt_text(output_stream, f'status={status}')
+    output_stream.write(PKT_FLUSH)
+    output_stream.flush()
+
+
+def _write_response(output_stream, content: bytes):
+    """Write a successful response carrying content and flush it"""
+    _write_pkt_text(output_stream, 'status=success')
+    output_stream.write(PKT_FLUSH)
+    _write_pkt_content(output_stream, content)
+    # Empty list keeps status=success
+    output_stream.write(PKT_FLUSH)
+    output_stream.flush()
+
+
+def _write_available_blobs(output_stream, delayed: Dict[str, Future]):
+    """Answer list_available_blobs, blocking until a delayed blob is ready"""
+    if delayed:
+        wait(delayed.values(), return_when=FIRST_COMPLETED)
+    for pathname, future in delayed.items():
+        if future.done():
+            _write_pkt_text(output_stream, f'pathname={pathname}')
+    output_stream.write(PKT_FLUSH)
+    _write_status(output_stream, 'success')
+
+
+# Filter instance owned by each pool worker process
+_worker_filter: Optional['SempressFilter'] = None
+
+
+def _warmup_worker():
+    """Pool initializer: load config, pandas and sempress once per worker"""
+    global _worker_filter
+    from . import codec  # noqa: F401 -- deferred import, done before the first blob
+    _worker_filter = SempressFilter()
+
+
+def _smudge_in_worker(content: bytes, pathname: Optional[str]) -> bytes:
+    """Run a smudge request inside a pool worker"""
+    result = io.BytesIO()
+    _worker_filter.smudge(io.BytesIO(content), filename=pathname, output_stream=result)
+    return result.getvalue()
+
+
+def run_process_filter():
+    """
+    Entry point for the long-running filter process.
+    Called by Git once per command: git-lfs-sempress process
+    
+    Keeps a single SempressFilter (and the pandas/sempress imports behind it)
+    alive for every blob Git sends, instead of one Python process per file.
+    During checkouts, smudge requests Git allows to be delayed are handed to
+    a pool of worker processes so several blobs decompress in parallel.
+    """
+    input_stream = io.BufferedReader(
+        io.FileIO(sys.stdin.fileno(), 'rb', closefd=False),
+        buffer_size=PIPE_BUFFER_SIZE
+    )
+    output_stream = io.BufferedWriter(
+        io.FileIO(sys.stdout.fileno(), 'wb', closefd=False),
+        buffer_size=PIPE_BUFFER_SIZE
+    )
+    
+    try:
+        filter_obj = SempressFilter()
+        workers = filter_obj.config.get_process_config().get('workers', 0) or os.cpu_count() or 1
+        offered = ('clean', 'smudge', 'delay') if workers > 1 else ('clean', 'smudge')
+        capabilities = _handshake(input_stream, output_stream, offered)
+    except Exception as e:
+        logger.error(f"Filter process startup failed: {e}", exc_info=True)
+        sys.exit(1)
+    
+    # Pool is started on the first delayable smudge; clean is never delayed
+    executor = None
+    delayed: Dict[str, Future] = {}
+    
+    try:
+        while True:
+            try:
+                headers = _parse_headers(_read_pkt_list(input_stream))
+                command = headers.get('command')
+                # list_available_blobs is the only command without content
+                content = _read_pkt_content(input_stream) if command != 'list_available_blobs' else b''
+            except EOFError:
+                # Git closed the pipe: no more blobs to filter
+                break
+            except Exception as e:
+                logger.error(f"Filter process protocol error: {e}", exc_info=True)
+                sys.exit(1)
+            
+            pathname = headers.get('pathname')
+            
+            if command == 'list_available_blobs':
+                _write_available_blobs(output_stream, delayed)
+                continue
+            
+            if command == 'smudge' and pathname in delayed:
+                # Git is collecting a blob it let us delay earlier
+                try:
+                    _write_response(output_stream, delayed.pop(pathname).result())
+                except Exception as e:
+                    logger.error(f"Filter process smudge error: {e}", exc_info=True)
+                    _write_status(output_stream, 'error')
+                continue
+            
+            if command == 'smudge' and headers.get('can-delay') == '1' and 'delay' in capabilities:
+                if executor is None:
+                    executor = ProcessPoolExecutor(max_workers=workers, initializer=_warmup_worker)
+                delayed[pathname] = executor.submit(_smudge_in_worker, content, pathname)
+                _write_status(output_stream, 'delayed')
+                continue
+            
+            # Git sends the whole blob before reading the reply, so the response
+            # is assembled in memory rather than streamed back
+            result = io.BytesIO()
+            try:
+                if command == 'clean':
+                    filter_obj.clean(io.BytesIO(content), filename=pathname, output_stream=result,
+                                     size=len(content))
+                elif command == 'smudge':
+                    filter_obj.smudge(io.BytesIO(content), filename=pathname, output_stream=result)
+                else:
+                    raise ValueError(f"Unsupported filter command: {command}")
+            except Exception as e:
+                logger.error(f"Filter process {command} error: {e}", exc_info=True)
+                _write_status(output_stream, 'error')
+                continue
+            
+            _write_response(output_stream, result.getbuffer())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
@@ -3,12 +3,17 @@ Extended format support for Sempress compression.
 Handles Parquet, JSON, Excel, and experimental image formats.
 """
 
-import tempfile
+import io
+import os
+import shutil
 from pathlib import Path
-from typing import Tuple, Optional
+from typing import IO, Tuple, Optional, Union
 import logging
 import pandas as pd
 import numpy as np
+import zstandard as zstd
+
+from .csvio import read_csv_frame, read_csv_path
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +24,38 @@ except ImportError:
     PIL_AVAILABLE = False
     logger.warning("Pillow not installed - image compression unavailable")
 
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Pixel rows per block when streaming an image's pixel table to CSV
+IMAGE_CSV_CHUNK_ROWS = 1 << 20
+
+# Below this many x/y pixel rows the NumPy scatter is already fast and the
+# JIT kernel isn't worth dispatching to
+NUMBA_MIN_PIXELS = 1 << 20
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _scatter_pixels(x, y, vals, img, w, h):
+        """Bounds-check, clip, cast and scatter pixel rows in one pass"""
+        for i in prange(x.shape[0]):
+            xf = x[i]
+            yf = y[i]
+            if xf > -1 and xf < w and yf > -1 and yf < h:
+                xi = int(xf)
+                yi = int(yf)
+                for c in range(vals.shape[1]):
+                    v = vals[i, c]
+                    if v > 255:
+                        img[yi, xi, c] = 255
+                    elif v >= 0:
+                        img[yi, xi, c] = np.uint8(v)
+                    else:
+                        img[yi, xi, c] = 0
+
 
 class FormatConverter:
     """Convert various formats to/from CSV for Sempress compression"""
@@ -42,23 +79,38 @@ class FormatConverter:
         return format_map.get(ext, 'unknown')
     
     @staticmethod
-    def to_csv(input_path: str, output_path: str) -> dict:
+    def write_table(df: pd.DataFrame, path: str, intermediate: str = 'csv') -> str:
         """
-        Convert various formats to CSV for compression.
-        Returns metadata needed for reconstruction.
+        Write an intermediate table as Parquet or CSV.
+        Returns the format actually written: tables Parquet can't
+        represent (e.g. mixed-type object columns) fall back to CSV.
         """
-        format_type = FormatConverter.detect_format(input_path)
-        
-        if format_type == 'csv':
-            # Already CSV, just copy
-            import shutil
-            shutil.copy(input_path, output_path)
-            return {'format': 'csv'}
+        if intermediate == 'parquet':
+            try:
+                df.to_parquet(path, compression='snappy', index=False)
+                return 'parquet'
+            except (ValueError, TypeError, NotImplementedError) as e:
+                logger.info(f"Table not representable as Parquet, using CSV: {e}")
         
-        elif format_type == 'parquet':
-            df = pd.read_parquet(input_path)
-            df.to_csv(output_path, index=False)
-            return {
+        df.to_csv(path, index=False)
+        return 'csv'
+    
+    @staticmethod
+    def read_table(path: str, metadata: dict) -> pd.DataFrame:
+        """Read an intermediate table written by write_table"""
+        if metadata.get('intermediate') == 'parquet':
+            return pd.read_parquet(path)
+        return read_csv_path(path)
+    
+    @staticmethod
+    def to_frame(source: Union[str, IO[bytes]], format_type: str) -> Tuple[pd.DataFrame, dict]:
+        """
+        Load a non-CSV input (path or binary file object) as a table.
+        Returns (table, metadata needed for reconstruction).
+        """
+        if format_type == 'parquet':
+            df = pd.read_parquet(source)
+            return df, {
                 'format': 'parquet',
                 'columns': list(df.columns),
                 'dtypes': {col: str(dtype) for col, dtype in df.dtypes.items()}
@@ -66,18 +118,16 @@ class FormatConverter:
         
         elif format_type == 'json':
             # Try to read as records (list of dicts)
-            df = pd.read_json(input_path)
-            df.to_csv(output_path, index=False)
-            return {
+            df = pd.read_json(source)
+            return df, {
                 'format': 'json',
                 'columns': list(df.columns),
                 'orient': 'records'
             }
         
         elif format_type == 'excel':
-            df = pd.read_excel(input_path)
-            df.to_csv(output_path, index=False)
-            return {
+            df = FormatConverter._read_excel(source)
+            return df, {
                 'format': 'excel',
                 'columns': list(df.columns),
                 'sheet_name': 'Sheet1'
@@ -87,25 +137,19 @@ class FormatConverter:
             if not PIL_AVAILABLE:
                 raise ImportError("Pillow required for image compression: pip install Pillow")
             
-            metadata = FormatConverter.image_to_csv(input_path, output_path)
-            return metadata
+            return FormatConverter.image_to_frame(source)
         
         else:
             raise ValueError(f"Unsupported format: {format_type}")
     
     @staticmethod
-    def from_csv(csv_path: str, output_path: str, metadata: dict):
+    def from_frame(df: pd.DataFrame, output: Union[str, IO[bytes]], metadata: dict):
         """
-        Convert CSV back to original format using metadata.
+        Write a table back in its original (non-CSV) format using metadata.
         """
         format_type = metadata.get('format')
         
-        if format_type == 'csv':
-            import shutil
-            shutil.copy(csv_path, output_path)
-        
-        elif format_type == 'parquet':
-            df = pd.read_csv(csv_path)
+        if format_type == 'parquet':
             # Restore dtypes if available
             if 'dtypes' in metadata:
                 for col, dtype in metadata['dtypes'].items():
@@ -113,66 +157,150 @@ class FormatConverter:
                         df[col] = df[col].astype(dtype)
                     except:
                         pass
-            df.to_parquet(output_path, index=False)
+            df.to_parquet(output, index=False)
         
         elif format_type == 'json':
-            df = pd.read_csv(csv_path)
             orient = metadata.get('orient', 'records')
-            df.to_json(output_path, orient=orient)
+            df.to_json(output, orient=orient)
         
         elif format_type == 'excel':
-            df = pd.read_csv(csv_path)
             sheet_name = metadata.get('sheet_name', 'Sheet1')
-            df.to_excel(output_path, sheet_name=sheet_name, index=False)
+            FormatConverter._write_excel(df, output, sheet_name)
         
         elif format_type == 'image':
-            FormatConverter.csv_to_image(csv_path, output_path, metadata)
+            FormatConverter.frame_to_image(df, output, metadata)
         
         else:
             raise ValueError(f"Cannot reconstruct format: {format_type}")
     
     @staticmethod
-    def image_to_csv(image_path: str, csv_path: str) -> dict:
+    def to_csv(input_path: str, output_path: str, intermediate: str = 'csv') -> dict:
+        """
+        Convert various formats to CSV for compression.
+        Returns metadata needed for reconstruction.
+        
+        With intermediate='parquet', non-CSV inputs are written as Parquet
+        instead; metadata['intermediate'] records which format was used.
         """
-        Convert image to CSV representation.
-        Each pixel becomes a row: (x, y, r, g, b, [alpha])
+        format_type = FormatConverter.detect_format(input_path)
+        
+        if format_type == 'csv':
+            # Already CSV, just copy
+            FormatConverter._copy_csv(input_path, output_path)
+            return {'format': 'csv'}
+        
+        df, metadata = FormatConverter.to_frame(input_path, format_type)
+        metadata['intermediate'] = FormatConverter.write_table(df, output_path, intermediate)
+        return metadata
+    
+    @staticmethod
+    def _read_excel(source: Union[str, IO[bytes]]) -> pd.DataFrame:
+        """
+        Read the first sheet of a workbook as a table, like pd.read_excel.
+        
+        Plain sheets (one header row of distinct names) are streamed straight
+        out of openpyxl's read-only mode, skipping pandas' per-cell parsing;
+        anything else (e.g. .xls) goes through pd.read_excel.
+        """
+        try:
+            import openpyxl
+            
+            workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        except Exception as e:
+            logger.debug(f"openpyxl could not open workbook, using pandas: {e}")
+            workbook = None
+        
+        if workbook is not None:
+            try:
+                rows = workbook.worksheets[0].iter_rows(values_only=True)
+                header = list(next(rows, ()))
+                if header and all(isinstance(name, str) for name in header) and len(set(header)) == len(header):
+                    data = list(rows)
+                    # pd.read_excel drops trailing empty rows
+                    while data and all(v is None for v in data[-1]):
+                        data.pop()
+                    return pd.DataFrame(data, columns=header)
+            finally:
+                workbook.close()
+            
+            if hasattr(source, 'seek'):
+                source.seek(0)
+        
+        return pd.read_excel(source)
+    
+    @staticmethod
+    def _write_excel(df: pd.DataFrame, output: Union[str, IO[bytes]], sheet_name: str):
+        """
+        Write a table as a single-sheet workbook, streaming rows through
+        openpyxl's write-only mode rather than building every cell in memory.
+        """
+        import openpyxl
+        
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append([str(col) for col in df.columns])
+        
+        # Missing values become empty cells, as with df.to_excel
+        table = df.astype(object).where(df.notna(), None)
+        for row in table.itertuples(index=False, name=None):
+            sheet.append(row)
+        
+        workbook.save(output)
+    
+    @staticmethod
+    def _copy_csv(src: str, dst: str):
+        """
+        Pass a CSV through unchanged: no-op when both paths are the same
+        file, otherwise a plain content copy (kernel-side on Linux).
+        """
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            return
+        shutil.copyfile(src, dst)
+    
+    @staticmethod
+    def from_csv(csv_path: str, output_path: str, metadata: dict):
+        """
+        Convert CSV back to original format using metadata.
+        """
+        if metadata.get('format') == 'csv':
+            FormatConverter._copy_csv(csv_path, output_path)
+        else:
+            df = FormatConverter.read_table(csv_path, metadata)
+            FormatConverter.from_frame(df, output_path, metadata)
+    
+    @staticmethod
+    def image_to_frame(image: Union[str, IO[bytes]]) -> Tuple[pd.DataFrame, dict]:
+        """
+        Convert image to a pixel table.
+        Each pixel becomes a row: (r, g, b, [alpha]), in row-major order,
+        so a pixel's coordinates are implied by its row index.
         
         This is experimental - semantic compression on pixel data!
         """
-        img = Image.open(image_path)
+        pixels, metadata = FormatConverter._load_pixels(image)
+        height, width = pixels.shape[:2]
+        
+        df = FormatConverter._pixel_table(pixels, 0, height)
+        
+        logger.info(f"Converted image to pixel table: {width}x{height} = {len(df)} pixels")
+        
+        return df, metadata
+    
+    @staticmethod
+    def _load_pixels(image: Union[str, IO[bytes]]) -> Tuple[np.ndarray, dict]:
+        """Open an image as an RGB/RGBA pixel array plus reconstruction metadata"""
+        img = Image.open(image)
         
         # Convert to RGB or RGBA
         if img.mode not in ('RGB', 'RGBA'):
             img = img.convert('RGB')
         
         width, height = img.size
-        has_alpha = img.mode == 'RGBA'
         
         # Convert to numpy array
         pixels = np.array(img)
         
-        # Reshape to table: (x, y, r, g, b, [alpha])
-        rows = []
-        for y in range(height):
-            for x in range(width):
-                pixel = pixels[y, x]
-                if has_alpha:
-                    rows.append([x, y, pixel[0], pixel[1], pixel[2], pixel[3]])
-                else:
-                    rows.append([x, y, pixel[0], pixel[1], pixel[2]])
-        
-        # Create DataFrame
-        if has_alpha:
-            df = pd.DataFrame(rows, columns=['x', 'y', 'r', 'g', 'b', 'alpha'])
-        else:
-            df = pd.DataFrame(rows, columns=['x', 'y', 'r', 'g', 'b'])
-        
-        # Save to CSV
-        df.to_csv(csv_path, index=False)
-        
-        logger.info(f"Converted image to CSV: {width}x{height} = {len(rows)} pixels")
-        
-        return {
+        return pixels, {
             'format': 'image',
             'width': width,
             'height': height,
@@ -181,116 +309,179 @@ class FormatConverter:
         }
     
     @staticmethod
-    def csv_to_image(csv_path: str, image_path: str, metadata: dict):
+    def _pixel_table(pixels: np.ndarray, y0: int, y1: int) -> pd.DataFrame:
+        """Pixel table rows (r, g, b, [alpha]) for image rows y0..y1"""
+        # Rows in row-major pixel order, built in one pass instead of per pixel.
+        # Each column gets its own contiguous array (rather than strided
+        # slices of one row-major 2-D table), which is how Sempress reads them.
+        # Channels stay uint8: Sempress and the CSV writer handle them as is
+        flat = pixels[y0:y1].reshape(-1, pixels.shape[-1])
+        channels = ['r', 'g', 'b', 'alpha'] if pixels.shape[-1] == 4 else ['r', 'g', 'b']
+        
+        return pd.DataFrame({
+            channel: np.ascontiguousarray(flat[:, i])
+            for i, channel in enumerate(channels)
+        })
+    
+    @staticmethod
+    def image_to_csv(image_path: str, csv_path: str, intermediate: str = 'csv') -> dict:
         """
-        Reconstruct image from CSV pixel data.
+        Convert image to CSV (or Parquet, see write_table) representation.
+        
+        CSV output is written in blocks of about IMAGE_CSV_CHUNK_ROWS pixels,
+        so memory is bounded by the block rather than the whole pixel table.
         """
-        df = pd.read_csv(csv_path)
+        if intermediate == 'parquet':
+            df, metadata = FormatConverter.image_to_frame(image_path)
+            metadata['intermediate'] = FormatConverter.write_table(df, csv_path, intermediate)
+            return metadata
+        
+        pixels, metadata = FormatConverter._load_pixels(image_path)
+        height, width = pixels.shape[:2]
+        block_rows = max(1, IMAGE_CSV_CHUNK_ROWS // max(width, 1))
         
+        with open(csv_path, 'w', newline='') as f:
+            # At least one block, so an empty image still gets its header
+            for y0 in range(0, max(height, 1), block_rows):
+                block = FormatConverter._pixel_table(pixels, y0, min(y0 + block_rows, height))
+                block.to_csv(f, header=(y0 == 0), index=False)
+        
+        logger.info(f"Converted image to pixel table: {width}x{height} = {width * height} pixels")
+        
+        metadata['intermediate'] = 'csv'
+        return metadata
+    
+    @staticmethod
+    def frame_to_image(df: pd.DataFrame, image: Union[str, IO[bytes]], metadata: dict):
+        """
+        Reconstruct image from a pixel table.
+        
+        Tables written by older versions carry explicit x/y columns; those
+        are scattered by coordinate instead of reshaped.
+        """
         width = metadata['width']
         height = metadata['height']
         mode = metadata['mode']
+        channels = ['r', 'g', 'b', 'alpha'] if mode == 'RGBA' else ['r', 'g', 'b']
+        
+        if 'x' not in df.columns:
+            # Rows are pixels in row-major order: clip to [0, 255] and reshape
+            values = np.clip(df[channels].to_numpy(dtype=np.float64), 0, 255).astype(np.uint8)
+            img_array = values.reshape(height, width, len(channels))
+            FormatConverter.array_to_image(img_array, image, metadata)
+            return
         
         # Create empty image array
-        if mode == 'RGBA':
-            img_array = np.zeros((height, width, 4), dtype=np.uint8)
-            channels = ['r', 'g', 'b', 'alpha']
-        else:
-            img_array = np.zeros((height, width, 3), dtype=np.uint8)
-            channels = ['r', 'g', 'b']
+        img_array = np.zeros((height, width, len(channels)), dtype=np.uint8)
+        
+        # Coordinates truncate toward zero, like int(); rows outside the
+        # image bounds (or with missing coordinates) are dropped
+        x_raw = df['x'].to_numpy(dtype=np.float64)
+        y_raw = df['y'].to_numpy(dtype=np.float64)
         
-        # Fill pixels from dataframe
-        for _, row in df.iterrows():
-            x = int(row['x'])
-            y = int(row['y'])
+        if NUMBA_AVAILABLE and len(df) >= NUMBA_MIN_PIXELS:
+            # Huge images: bounds-check, clip, cast and scatter in one JIT pass
+            values = np.ascontiguousarray(df[channels].to_numpy(dtype=np.float64))
+            _scatter_pixels(x_raw, y_raw, values, img_array, width, height)
+        else:
+            mask = (x_raw > -1) & (x_raw < width) & (y_raw > -1) & (y_raw < height)
+            x = x_raw[mask].astype(np.intp)
+            y = y_raw[mask].astype(np.intp)
             
-            # Clip coordinates to image bounds
-            if 0 <= x < width and 0 <= y < height:
-                for i, channel in enumerate(channels):
-                    # Clip values to valid range [0, 255]
-                    value = np.clip(row[channel], 0, 255)
-                    img_array[y, x, i] = int(value)
+            # Clip values to valid range [0, 255]
+            values = np.clip(df[channels].to_numpy(dtype=np.float64)[mask], 0, 255).astype(np.uint8)
+            
+            # Fill pixels from dataframe in a single scatter
+            img_array[y, x] = values
         
+        FormatConverter.array_to_image(img_array, image, metadata)
+    
+    @staticmethod
+    def array_to_image(img_array: np.ndarray, image: Union[str, IO[bytes]], metadata: dict):
+        """
+        Save a (height, width, channels) uint8 pixel array as an image.
+        """
         # Create image
-        img = Image.fromarray(img_array, mode=mode)
+        img = Image.fromarray(img_array, mode=metadata['mode'])
         
         # Save in original format
         original_format = metadata.get('original_format', 'PNG')
-        img.save(image_path, format=original_format)
+        img.save(image, format=original_format)
         
-        logger.info(f"Reconstructed image: {width}x{height} as {original_format}")
+        logger.info(f"Reconstructed image: {metadata['width']}x{metadata['height']} as {original_format}")
+    
+    @staticmethod
+    def csv_to_image(csv_path: str, image_path: str, metadata: dict):
+        """
+        Reconstruct image from CSV (or Parquet) pixel data.
+        """
+        df = FormatConverter.read_table(csv_path, metadata)
+        FormatConverter.frame_to_image(df, image_path, metadata)
 
 
 class MultiFormatCompressor:
     """Wrapper around Sempress for multiple formats"""
     
-    def __init__(self, compressor):
+    def __init__(self, compressor, intermediate: str = 'frame'):
         self.compressor = compressor
         self.converter = FormatConverter()
+        self.intermediate = intermediate
     
     def compress(self, input_data: bytes, filename: str) -> Tuple[bytes, dict]:
         """
         Compress any supported format.
         Returns (compressed_data, metadata)
+        
+        Everything happens in memory. With the 'frame' intermediate (the
+        default) the parsed table is handed to Sempress as-is, typed, rather
+        than rendered as CSV text; 'csv' renders it first. Images skip the table entirely: their pixels
+        are stored as a raw uint8 blob, with the shape kept in metadata.
         """
         # Detect format
         format_type = self.converter.detect_format(filename)
         
-        # Write input to temp file
-        with tempfile.NamedTemporaryFile(suffix=Path(filename).suffix, delete=False) as tmp_input:
-            tmp_input.write(input_data)
-            input_path = tmp_input.name
+        if format_type == 'csv':
+            # Already CSV, compress as-is
+            return self.compressor.compress(input_data), {'format': 'csv'}
         
-        try:
-            # Convert to CSV
-            csv_path = input_path + '.csv'
-            metadata = self.converter.to_csv(input_path, csv_path)
-            
-            # Compress CSV
-            with open(csv_path, 'rb') as f:
-                csv_data = f.read()
-            
-            compressed_data = self.compressor.compress(csv_data)
-            
-            # Clean up
-            Path(input_path).unlink(missing_ok=True)
-            Path(csv_path).unlink(missing_ok=True)
-            
-            return compressed_data, metadata
-            
-        except Exception as e:
-            # Clean up on error
-            Path(input_path).unlink(missing_ok=True)
-            Path(csv_path).unlink(missing_ok=True)
-            raise e
+        if format_type == 'image':
+            pixels, metadata = self.converter._load_pixels(io.BytesIO(input_data))
+            metadata['intermediate'] = 'raw'
+            metadata['shape'] = list(pixels.shape)
+            metadata['dtype'] = str(pixels.dtype)
+            return zstd.ZstdCompressor().compress(pixels.tobytes()), metadata
+        
+        df, metadata = self.converter.to_frame(io.BytesIO(input_data), format_type)
+        
+        if self.intermediate == 'frame':
+            metadata['intermediate'] = 'frame'
+            return self.compressor.compress_frame(df), metadata
+        
+        csv_buf = io.BytesIO()
+        df.to_csv(csv_buf, index=False)
+        metadata['intermediate'] = 'csv'
+        return self.compressor.compress(csv_buf.getvalue()), metadata
     
     def decompress(self, compressed_data: bytes, metadata: dict, output_filename: str) -> bytes:
         """
         Decompress and convert back to original format.
         """
-        # Decompress to CSV
-        csv_data = self.compressor.decompress(compressed_data)
+        if metadata.get('format') == 'csv':
+            return self.compressor.decompress(compressed_data)
         
-        # Write CSV to temp file
-        with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as tmp_csv:
-            tmp_csv.write(csv_data)
-            csv_path = tmp_csv.name
+        output = io.BytesIO()
         
-        try:
-            # Convert from CSV to original format
-            output_path = csv_path.replace('.csv', Path(output_filename).suffix)
-            self.converter.from_csv(csv_path, output_path, metadata)
-            
-            # Read result
-            with open(output_path, 'rb') as f:
-                result_data = f.read()
-            
-            # Clean up
-            Path(csv_path).unlink(missing_ok=True)
-            Path(output_path).unlink(missing_ok=True)
-            
-            return result_data
-            
-        except Exception as e:
-            Path(csv_path).unlink(missing_ok=True)
-            raise e
+        if metadata.get('intermediate') == 'raw':
+            raw = zstd.ZstdDecompressor().decompress(compressed_data)
+            pixels = np.frombuffer(raw, dtype=metadata['dtype']).reshape(metadata['shape'])
+            self.converter.array_to_image(pixels, output, metadata)
+            return output.getvalue()
+        
+        # 'parquet' is what 'frame' was recorded as before it was renamed
+        if metadata.get('intermediate') in ('frame', 'parquet'):
+            df = self.compressor.decompress_frame(compressed_data)
+        else:
+            df = read_csv_frame(self.compressor.decompress(compressed_data))
+        
+        self.converter.from_frame(df, output, metadata)
+        return output.getvalue()
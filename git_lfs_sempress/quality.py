@@ -3,14 +3,48 @@ Quality monitoring and reporting for Sempress compression.
 Detects and reports data variations with actionable guidance.
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import logging
 
+from .csvio import read_csv_path
+
+try:
+    # Compares string columns on Arrow's UTF-8 buffers, without boxing cells
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pc = None
+
 logger = logging.getLogger(__name__)
 
 
+def _string_equality(orig: pd.Series, recon: pd.Series) -> Tuple[int, Optional[int]]:
+    """
+    Compare two string columns cell by cell, like orig == recon.
+    Returns (number of equal cells, position of the first mismatch or None).
+    """
+    if pc is not None:
+        try:
+            # Missing values never compare equal, as in pandas
+            eq = pc.fill_null(pc.equal(pa.array(orig), pa.array(recon)), False)
+            first = pc.index(eq, False).as_py()
+            return pc.sum(eq).as_py() or 0, (first if first >= 0 else None)
+        except pa.ArrowException:
+            # e.g. object columns mixing strings and numbers
+            pass
+    
+    # pandas' == already treats missing cells as unequal; one mask serves
+    # both the count and the first mismatch
+    mismatch = ~(orig == recon).to_numpy()
+    if not mismatch.any():
+        return len(mismatch), None
+    return len(mismatch) - int(np.count_nonzero(mismatch)), int(mismatch.argmax())
+
+
 class QualityReport:
     """Comprehensive quality report for compression/decompression"""
     
@@ -20,9 +54,17 @@ class QualityReport:
         self.issues = []
         self.warnings = []
         self.metrics = {}
+        self._report = None
+        self._total_exact = 0
         
     def analyze(self) -> Dict:
-        """Run full quality analysis"""
+        """Run full quality analysis (once; later calls return the same report)"""
+        if self._report is None:
+            self._report = self._run_analysis()
+        return self._report
+    
+    def _run_analysis(self) -> Dict:
+        """Run every check and build the report"""
         
         # 1. Shape check
         if self.original.shape != self.reconstructed.shape:
@@ -49,29 +91,52 @@ class QualityReport:
             })
             return self._build_report()
         
-        # 3. Check each column
-        for col in self.original.columns:
-            self._check_column(col)
+        # 3. Check each column, counting exact cells as we go. Columns are
+        # independent NumPy work (which releases the GIL), so they run on a
+        # thread pool and are merged back in column order
+        columns = list(self.original.columns)
+        workers = min(len(columns), os.cpu_count() or 1)
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(self._check_column, columns))
+        else:
+            results = [self._check_column(col) for col in columns]
+        
+        for col, (metrics, issues, warnings, exact) in zip(columns, results):
+            if metrics is not None:
+                self.metrics[col] = metrics
+            self.issues.extend(issues)
+            self.warnings.extend(warnings)
+            self._total_exact += exact
         
-        # 4. Calculate overall similarity
-        self._calculate_similarity()
+        # 4. Overall similarity
+        self.metrics['overall_similarity'] = (self._total_exact / self.original.size) * 100
         
         return self._build_report()
     
-    def _check_column(self, col: str):
-        """Check quality of a single column"""
+    def _check_column(self, col: str) -> Tuple[Optional[Dict], List[Dict], List[Dict], int]:
+        """
+        Check quality of a single column.
+        Returns (column metrics, issues, warnings, exact cell count) without
+        touching the report, so columns can be checked concurrently.
+        """
         orig = self.original[col]
         recon = self.reconstructed[col]
+        metrics = None
+        issues = []
+        warnings = []
+        exact = 0
         
-        # String/categorical columns should be exact
-        if orig.dtype == 'object' or pd.api.types.is_categorical_dtype(orig):
-            matches = (orig == recon).sum()
+        # String/categorical columns should be exact (pandas' str dtype is kind 'O')
+        if orig.dtype.kind in ('O', 'U') or isinstance(orig.dtype, pd.CategoricalDtype):
+            matches, first_mismatch = _string_equality(orig, recon)
+            exact = matches
             total = len(orig)
             match_pct = (matches / total) * 100
             
             if match_pct < 100:
                 mismatches = total - matches
-                self.issues.append({
+                issues.append({
                     'severity': 'ERROR',
                     'type': 'string_mismatch',
                     'column': col,
@@ -80,21 +145,25 @@ class QualityReport:
                 })
                 
                 # Show examples of differences
-                diff_idx = (orig != recon).idxmax()
-                if diff_idx is not None:
-                    self.issues[-1]['example'] = f"Row {diff_idx}: '{orig[diff_idx]}' -> '{recon[diff_idx]}'"
+                if first_mismatch is not None:
+                    diff_idx = orig.index[first_mismatch]
+                    issues[-1]['example'] = (
+                        f"Row {diff_idx}: '{orig.iloc[first_mismatch]}' -> '{recon.iloc[first_mismatch]}'"
+                    )
             
-            self.metrics[col] = {'type': 'string', 'match_pct': match_pct}
+            metrics = {'type': 'string', 'match_pct': match_pct}
         
         # Numeric columns - check error
-        elif pd.api.types.is_numeric_dtype(orig):
-            orig_vals = orig.values.astype(float)
-            recon_vals = recon.values.astype(float)
+        elif orig.dtype.kind in 'biufc':
+            orig_vals = orig.to_numpy(dtype=np.float64, copy=False)
+            recon_vals = recon.to_numpy(dtype=np.float64, copy=False)
             
-            # Calculate error metrics
-            mae = np.mean(np.abs(orig_vals - recon_vals))
-            rmse = np.sqrt(np.mean((orig_vals - recon_vals) ** 2))
-            max_error = np.max(np.abs(orig_vals - recon_vals))
+            # Calculate error metrics, all from a single difference array
+            diff = orig_vals - recon_vals
+            abs_diff = np.abs(diff)
+            mae = abs_diff.mean()
+            rmse = np.sqrt(np.dot(diff, diff) / len(diff))
+            max_error = abs_diff.max()
             
             mean_val = np.mean(np.abs(orig_vals))
             if mean_val > 0:
@@ -103,10 +172,13 @@ class QualityReport:
                 rel_error = 0
             
             # Check for exact match
-            exact_matches = np.sum(orig_vals == recon_vals)
+            exact_matches = np.count_nonzero(diff == 0)
             exact_pct = (exact_matches / len(orig_vals)) * 100
             
-            self.metrics[col] = {
+            # For overall similarity, count as match if difference < 1e-10
+            exact = np.count_nonzero(abs_diff < 1e-10)
+            
+            metrics = {
                 'type': 'numeric',
                 'mae': mae,
                 'rmse': rmse,
@@ -124,7 +196,7 @@ class QualityReport:
                 logger.info(f"{col}: Excellent quality ({rel_error:.4f}% error)")
             elif rel_error < 0.1:  # < 0.1% error
                 # Good quality - minor warning
-                self.warnings.append({
+                warnings.append({
                     'severity': 'INFO',
                     'type': 'minor_error',
                     'column': col,
@@ -134,7 +206,7 @@ class QualityReport:
                 })
             elif rel_error < 1.0:  # < 1% error
                 # Acceptable but noticeable
-                self.warnings.append({
+                warnings.append({
                     'severity': 'WARNING',
                     'type': 'moderate_error',
                     'column': col,
@@ -144,7 +216,7 @@ class QualityReport:
                 })
             else:  # >= 1% error
                 # Significant error
-                self.issues.append({
+                issues.append({
                     'severity': 'ERROR',
                     'type': 'high_error',
                     'column': col,
@@ -152,27 +224,9 @@ class QualityReport:
                     'details': f"MAE: {mae:.6f}, Max error: {max_error:.6f}",
                     'fix': f"Add '{col}' to residual_cols or lock_cols in .sempress.yml."
                 })
-    
-    def _calculate_similarity(self):
-        """Calculate overall similarity score"""
-        total_cells = self.original.size
-        exact_matches = 0
-        
-        for col in self.original.columns:
-            orig = self.original[col]
-            recon = self.reconstructed[col]
-            
-            if orig.dtype == 'object':
-                exact_matches += (orig == recon).sum()
-            else:
-                # For numeric, count as match if difference < 1e-10
-                orig_vals = orig.values.astype(float)
-                recon_vals = recon.values.astype(float)
-                exact_matches += np.sum(np.abs(orig_vals - recon_vals) < 1e-10)
-        
-        similarity_pct = (exact_matches / total_cells) * 100
-        self.metrics['overall_similarity'] = similarity_pct
         
+        return metrics, issues, warnings, exact
+    
     def _build_report(self) -> Dict:
         """Build final report dictionary"""
         return {
@@ -187,7 +241,7 @@ class QualityReport:
     
     def print_report(self, verbose=False):
         """Print human-readable report"""
-        report = self.analyze() if not self.metrics else self._build_report()
+        report = self._report or self.analyze()
         
         print("\n" + "="*60)
         print("SEMPRESS QUALITY REPORT")
@@ -287,13 +341,11 @@ def compare_files(original_path: str, reconstructed_path: str, verbose=False) ->
     Returns quality report dictionary.
     """
     try:
-        df_original = pd.read_csv(original_path)
-        df_reconstructed = pd.read_csv(reconstructed_path)
+        df_original = read_csv_path(original_path)
+        df_reconstructed = read_csv_path(reconstructed_path)
         
         qr = QualityReport(df_original, df_reconstructed)
-        qr.print_report(verbose=verbose)
-        
-        return qr._build_report()
+        return qr.print_report(verbose=verbose)
         
     except Exception as e:
         logger.error(f"Failed to compare files: {e}")
@@ -4,12 +4,22 @@ Advanced image compression experiments using Sempress.
 Tests different approaches to image-as-data compression.
 """
 
+import contextlib
+import gzip
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from PIL import Image
 import pandas as pd
-from pathlib import Path
-import tempfile
 import sys
+import zstandard as zstd
+
+try:
+    import pyarrow  # noqa: F401 -- feather writer for the binary size metric
+    FEATHER_AVAILABLE = True
+except ImportError:
+    FEATHER_AVAILABLE = False
 
 def create_test_images():
     """Create various test images with different characteristics"""
@@ -17,14 +27,11 @@ def create_test_images():
     
     # 1. Smooth gradient (should compress well)
     width, height = 200, 200
-    gradient = np.zeros((height, width, 3), dtype=np.uint8)
-    for y in range(height):
-        for x in range(width):
-            gradient[y, x] = [
-                int(255 * x / width),
-                int(255 * y / height),
-                128
-            ]
+    ys, xs = np.mgrid[0:height, 0:width]
+    gradient = np.empty((height, width, 3), dtype=np.uint8)
+    gradient[..., 0] = 255 * xs // width
+    gradient[..., 1] = 255 * ys // height
+    gradient[..., 2] = 128
     images['gradient'] = Image.fromarray(gradient, 'RGB')
     
     # 2. Solid colors with rectangles (very compressible)
@@ -34,42 +41,57 @@ def create_test_images():
     images['blocks'] = Image.fromarray(solid, 'RGB')
     
     # 3. Repeated pattern (should compress well)
+    # Checkerboard pattern: white where (x // 20 + y // 20) is even
+    white = (xs // 20 + ys // 20) % 2 == 0
     pattern = np.zeros((height, width, 3), dtype=np.uint8)
-    for y in range(height):
-        for x in range(width):
-            # Checkerboard pattern
-            if (x // 20 + y // 20) % 2 == 0:
-                pattern[y, x] = [255, 255, 255]
-            else:
-                pattern[y, x] = [0, 0, 0]
+    pattern[white] = 255
     images['checkerboard'] = Image.fromarray(pattern, 'RGB')
     
     # 4. Random noise (won't compress well)
-    np.random.seed(42)
-    noise = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+    rng = np.random.default_rng(42)
+    noise = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
     images['noise'] = Image.fromarray(noise, 'RGB')
     
     return images
 
+def _coord_dtype(width, height):
+    """Smallest signed integer dtype that holds every coordinate"""
+    return np.int16 if max(width, height) <= np.iinfo(np.int16).max else np.int32
+
 def method1_naive_pixels(img):
-    """Method 1: Naive pixel table (x, y, r, g, b)"""
-    width, height = img.size
-    pixels = np.array(img)
+    """Method 1: Naive pixel table (x, y, r, g, b); img may be a PIL image or its RGB array"""
+    pixels = np.asarray(img)
+    height, width = pixels.shape[:2]
     
-    rows = []
-    for y in range(height):
-        for x in range(width):
-            pixel = pixels[y, x]
-            rows.append([x, y, pixel[0], pixel[1], pixel[2]])
+    # Row-major pixel order; channels stay uint8
+    ys, xs = np.mgrid[0:height, 0:width]
+    flat = pixels.reshape(-1, 3)
+    coord = _coord_dtype(width, height)
     
-    df = pd.DataFrame(rows, columns=['x', 'y', 'r', 'g', 'b'])
+    df = pd.DataFrame({
+        'x': xs.ravel().astype(coord),
+        'y': ys.ravel().astype(coord),
+        'r': flat[:, 0],
+        'g': flat[:, 1],
+        'b': flat[:, 2],
+    })
     return df
 
-def method2_downsampled(img, factor=2):
-    """Method 2: Downsample before converting to pixels"""
+def method2_downsampled(img, factor=2, quality='fast'):
+    """
+    Method 2: Downsample before converting to pixels.
+    quality='fast' averages factor x factor boxes; 'lanczos' uses PIL's
+    Lanczos filter, for experiments that care about PSNR.
+    """
     # Resize image smaller
     new_size = (img.width // factor, img.height // factor)
-    small_img = img.resize(new_size, Image.LANCZOS)
+    if quality == 'fast':
+        # Integer box average over the whole blocks only, same size as resize()
+        small_img = img.reduce(factor, box=(0, 0, new_size[0] * factor, new_size[1] * factor))
+    elif quality == 'lanczos':
+        small_img = img.resize(new_size, Image.LANCZOS)
+    else:
+        raise ValueError(f"Unknown quality: {quality}")
     
     # Convert to pixel table
     df = method1_naive_pixels(small_img)
@@ -78,59 +100,172 @@ def method2_downsampled(img, factor=2):
 
 def method3_color_quantization(img, colors=64):
     """Method 3: Reduce color palette before pixelization"""
-    # Quantize colors (reduce to N colors)
-    quantized = img.quantize(colors=colors).convert('RGB')
+    # Quantize colors (reduce to N colors); octree is one pass over the pixels
+    quantized = img.quantize(colors=colors, method=Image.Quantize.FASTOCTREE).convert('RGB')
     return method1_naive_pixels(quantized)
 
-def method4_blocks(img, block_size=10):
-    """Method 4: Average blocks instead of individual pixels"""
+def method3b_palette_indexed(img, colors=64):
+    """Method 3b: Quantize, then keep the palette (x, y, idx) + (idx, r, g, b)"""
     width, height = img.size
-    pixels = np.array(img)
+    quantized = img.quantize(colors=colors, method=Image.Quantize.FASTOCTREE)
+    indices = np.asarray(quantized)
     
-    rows = []
-    for y in range(0, height, block_size):
-        for x in range(0, width, block_size):
-            # Get block
-            block = pixels[y:y+block_size, x:x+block_size]
-            # Average color
-            avg_color = np.mean(block, axis=(0, 1))
-            rows.append([
-                x // block_size,
-                y // block_size,
-                int(avg_color[0]),
-                int(avg_color[1]),
-                int(avg_color[2])
-            ])
+    ys, xs = np.mgrid[0:height, 0:width]
+    coord = _coord_dtype(width, height)
+    pixels = pd.DataFrame({
+        'x': xs.ravel().astype(coord),
+        'y': ys.ravel().astype(coord),
+        'idx': indices.ravel(),
+    })
+    
+    # Only the entries the image actually uses
+    used = np.unique(indices)
+    palette = np.asarray(quantized.getpalette()[:3 * 256], dtype=np.uint8).reshape(-1, 3)[used]
+    palette_df = pd.DataFrame({
+        'idx': used,
+        'r': palette[:, 0],
+        'g': palette[:, 1],
+        'b': palette[:, 2],
+    })
+    return pixels, palette_df
+
+def method4_blocks(img, block_size=10):
+    """Method 4: Average blocks instead of individual pixels; img may be a PIL image or its RGB array"""
+    pixels = np.asarray(img)
+    height, width = pixels.shape[:2]
     
-    df = pd.DataFrame(rows, columns=['block_x', 'block_y', 'r', 'g', 'b'])
+    # Per-block channel sums in one reduction over both axes; edge blocks
+    # may be smaller than block_size, so divide by each block's own area
+    y_starts = np.arange(0, height, block_size)
+    x_starts = np.arange(0, width, block_size)
+    # (uint32 holds 255 * area for any block under 16.8M pixels; integer
+    # division truncates exactly like the float divide + uint8 cast did)
+    sums = np.add.reduceat(np.add.reduceat(pixels, y_starts, axis=0, dtype=np.uint32), x_starts, axis=1)
+    areas = np.outer(np.diff(y_starts, append=height), np.diff(x_starts, append=width)).astype(np.uint32)
+    avg_color = (sums // areas[..., None]).astype(np.uint8).reshape(-1, 3)
+    
+    block_y, block_x = np.mgrid[0:len(y_starts), 0:len(x_starts)]
+    coord = _coord_dtype(len(x_starts), len(y_starts))
+    df = pd.DataFrame({
+        'block_x': block_x.ravel().astype(coord),
+        'block_y': block_y.ravel().astype(coord),
+        'r': avg_color[:, 0],
+        'g': avg_color[:, 1],
+        'b': avg_color[:, 2],
+    })
     df['block_size'] = block_size
     return df
 
-def compress_dataframe(df):
-    """Simulate compression by measuring CSV size"""
-    # Write to temp CSV
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False) as f:
-        df.to_csv(f, index=False)
-        csv_path = f.name
-    
-    size = Path(csv_path).stat().st_size
-    Path(csv_path).unlink()
-    return size
+# One in-memory buffer per process, rewound for every measurement
+_CSV_BUF = io.BytesIO()
+
+# General-purpose baselines for the CSV text: fast gzip and default-level zstd
+CSV_CODECS = ('none', 'gz1', 'zstd')
+_ZSTD = zstd.ZstdCompressor(level=3)
+
+def _encoded_size(data, codec):
+    """Size of CSV bytes after the given codec"""
+    if codec == 'none':
+        return len(data)
+    if codec == 'gz1':
+        return len(gzip.compress(data, compresslevel=1, mtime=0))
+    if codec == 'zstd':
+        return len(_ZSTD.compress(data))
+    raise ValueError(f"Unknown codec: {codec}")
+
+def compress_dataframe_codecs(df, codecs=CSV_CODECS):
+    """CSV size under each codec, from a single serialization"""
+    # Serialize in memory; no temp file to write, stat and unlink
+    _CSV_BUF.seek(0)
+    _CSV_BUF.truncate(0)
+    df.to_csv(_CSV_BUF, index=False)
+    with _CSV_BUF.getbuffer() as data:
+        return {codec: _encoded_size(data, codec) for codec in codecs}
+
+def compress_dataframe(df, codec='none'):
+    """Simulate compression by measuring CSV size ('none', 'gz1' or 'zstd')"""
+    return compress_dataframe_codecs(df, (codec,))[codec]
+
+def compress_dataframe_binary(df):
+    """Measure the table as zstd-compressed feather (columnar binary), or None without pyarrow"""
+    if not FEATHER_AVAILABLE:
+        return None
+    buf = io.BytesIO()
+    df.to_feather(buf, compression='zstd')
+    return buf.tell()
+
+def print_binary_size(size):
+    """Print the binary size line for a method, if it was measured"""
+    if size is not None:
+        print(f"  Binary size (feather+zstd): {size:,} bytes")
+
+def print_packed_sizes(packed):
+    """Print the compressed-CSV baseline sizes for a method"""
+    print(f"  CSV + gzip-1: {packed['gz1']:,} bytes")
+    print(f"  CSV + zstd-3: {packed['zstd']:,} bytes")
+
+# The pixelization methods measured per image, as (key, function, kwargs,
+# whether it works from the cached pixel array rather than the PIL image)
+METHODS = [
+    ('method1', method1_naive_pixels, {}, True),
+    ('method2', method2_downsampled, {'factor': 2}, False),
+    ('method3', method3_color_quantization, {'colors': 64}, False),
+    ('method3b', method3b_palette_indexed, {'colors': 64}, False),
+    ('method4', method4_blocks, {'block_size': 10}, True),
+]
+
+def _measure(job):
+    """
+    Build one method's table and measure it; runs in a worker process.
+    A method may return several tables (e.g. pixels + palette); sizes are summed
+    and the row count is that of the first.
+    """
+    img_name, key, fn, img, kwargs = job
+    tables = fn(img, **kwargs)
+    if isinstance(tables, pd.DataFrame):
+        tables = (tables,)
+    csv = [compress_dataframe_codecs(df) for df in tables]
+    packed = {codec: sum(sizes[codec] for sizes in csv) for codec in CSV_CODECS}
+    size = packed.pop('none')
+    binary = [compress_dataframe_binary(df) for df in tables]
+    binary = None if None in binary else sum(binary)
+    return (img_name, key), (size, binary, len(tables[0]), packed)
+
+def measure_methods(images):
+    """
+    Measure every (image, method) pair, keyed by (image name, method key).
+    The pairs are independent and CPU-bound in pandas' CSV writer, so they
+    are spread over a process pool when more than one core is available.
+    """
+    # Each image's pixel array is built once and shared by the array methods
+    arrays = {img_name: np.asarray(img) for img_name, img in images.items()}
+    jobs = [(img_name, key, fn, arrays[img_name] if uses_pixels else img, kwargs)
+            for img_name, img in images.items()
+            for key, fn, kwargs, uses_pixels in METHODS]
+    workers = min(len(jobs), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            return dict(ex.map(_measure, jobs))
+    return dict(map(_measure, jobs))
 
 def calculate_psnr(original, reconstructed):
     """Calculate Peak Signal-to-Noise Ratio"""
-    mse = np.mean((np.array(original) - np.array(reconstructed)) ** 2)
+    # int16 holds any difference of two uint8 values without wrapping; the
+    # square (up to 255**2) does not fit, so it is taken in float64
+    diff = np.asarray(original, dtype=np.int16) - np.asarray(reconstructed, dtype=np.int16)
+    mse = np.mean(np.square(diff, dtype=np.float64))
     if mse == 0:
         return float('inf')
     return 20 * np.log10(255.0 / np.sqrt(mse))
 
-def main():
+def print_report():
     print("=" * 60)
     print("SEMPRESS IMAGE COMPRESSION EXPERIMENTS")
     print("=" * 60)
     print()
     
     images = create_test_images()
+    measured = measure_methods(images)
     
     results = []
     
@@ -138,11 +273,10 @@ def main():
         print(f"\nTesting: {img_name.upper()}")
         print("-" * 60)
         
-        # Original size
-        with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as f:
-            img.save(f.name)
-            original_size = Path(f.name).stat().st_size
-            original_path = f.name
+        # Original size, encoded in memory
+        buf = io.BytesIO()
+        img.save(buf, 'PNG')
+        original_size = buf.tell()
         
         raw_size = img.width * img.height * 3  # Raw RGB bytes
         
@@ -152,20 +286,22 @@ def main():
         
         # Method 1: Naive pixels
         print("Method 1: Naive pixel table")
-        df1 = method1_naive_pixels(img)
-        size1 = compress_dataframe(df1)
+        size1, binary1, _, packed1 = measured[(img_name, 'method1')]
         ratio1 = raw_size / size1
         print(f"  CSV size: {size1:,} bytes")
+        print_binary_size(binary1)
+        print_packed_sizes(packed1)
         print(f"  Ratio vs raw: {ratio1:.2f}×")
         print(f"  ❌ WORSE than PNG: {size1 / original_size:.2f}× LARGER")
         print()
         
         # Method 2: Downsampled
         print("Method 2: Downsample 2× before pixelization")
-        df2 = method2_downsampled(img, factor=2)
-        size2 = compress_dataframe(df2)
+        size2, binary2, _, packed2 = measured[(img_name, 'method2')]
         ratio2 = raw_size / size2
         print(f"  CSV size: {size2:,} bytes")
+        print_binary_size(binary2)
+        print_packed_sizes(packed2)
         print(f"  Ratio vs raw: {ratio2:.2f}×")
         if size2 < original_size:
             print(f"  ✓ Better than PNG: {original_size / size2:.2f}×")
@@ -175,21 +311,34 @@ def main():
         
         # Method 3: Color quantization
         print("Method 3: Reduce to 64 colors first")
-        df3 = method3_color_quantization(img, colors=64)
-        size3 = compress_dataframe(df3)
+        size3, binary3, _, packed3 = measured[(img_name, 'method3')]
         ratio3 = raw_size / size3
         print(f"  CSV size: {size3:,} bytes")
+        print_binary_size(binary3)
+        print_packed_sizes(packed3)
         print(f"  Ratio vs raw: {ratio3:.2f}×")
         print()
         
+        # Method 3b: Palette-indexed
+        print("Method 3b: 64 colors, palette index per pixel")
+        size3b, binary3b, _, packed3b = measured[(img_name, 'method3b')]
+        ratio3b = raw_size / size3b
+        print(f"  CSV size: {size3b:,} bytes (pixels + palette)")
+        print_binary_size(binary3b)
+        print_packed_sizes(packed3b)
+        print(f"  Ratio vs raw: {ratio3b:.2f}×")
+        print(f"  vs RGB quantized: {size3 / size3b:.2f}× smaller")
+        print()
+        
         # Method 4: Block averaging
         print("Method 4: 10×10 pixel blocks (average color)")
-        df4 = method4_blocks(img, block_size=10)
-        size4 = compress_dataframe(df4)
+        size4, binary4, rows4, packed4 = measured[(img_name, 'method4')]
         ratio4 = raw_size / size4
         print(f"  CSV size: {size4:,} bytes")
+        print_binary_size(binary4)
+        print_packed_sizes(packed4)
         print(f"  Ratio vs raw: {ratio4:.2f}×")
-        print(f"  Blocks: {len(df4)} (vs {img.width * img.height} pixels)")
+        print(f"  Blocks: {rows4} (vs {img.width * img.height} pixels)")
         if size4 < original_size:
             print(f"  ✓ Better than PNG: {original_size / size4:.2f}×")
         else:
@@ -203,10 +352,19 @@ def main():
             'method1_size': size1,
             'method2_size': size2,
             'method3_size': size3,
+            'method3b_size': size3b,
             'method4_size': size4,
+            'method1_binary': binary1,
+            'method1_zstd': packed1['zstd'],
+            'method2_binary': binary2,
+            'method2_zstd': packed2['zstd'],
+            'method3_binary': binary3,
+            'method3_zstd': packed3['zstd'],
+            'method3b_binary': binary3b,
+            'method3b_zstd': packed3b['zstd'],
+            'method4_binary': binary4,
+            'method4_zstd': packed4['zstd'],
         })
-        
-        Path(original_path).unlink()
     
     # Summary
     print("\n" + "=" * 60)
@@ -224,6 +382,7 @@ def main():
             'Naive pixels': result['method1_size'],
             'Downsampled': result['method2_size'],
             'Color quantized': result['method3_size'],
+            'Palette indexed': result['method3b_size'],
             'Blocks': result['method4_size'],
         }
         
@@ -233,6 +392,25 @@ def main():
         print(f"\n{img_name.upper()}:")
         print(f"  PNG: {png_size:,} bytes")
         print(f"  Best: {best_method} = {best_size:,} bytes")
+        if FEATHER_AVAILABLE:
+            binary = {
+                'Naive pixels': result['method1_binary'],
+                'Downsampled': result['method2_binary'],
+                'Color quantized': result['method3_binary'],
+                'Palette indexed': result['method3b_binary'],
+                'Blocks': result['method4_binary'],
+            }
+            best_binary = min(binary, key=binary.get)
+            print(f"  Best binary: {best_binary} = {binary[best_binary]:,} bytes")
+        packed = {
+            'Naive pixels': result['method1_zstd'],
+            'Downsampled': result['method2_zstd'],
+            'Color quantized': result['method3_zstd'],
+            'Palette indexed': result['method3b_zstd'],
+            'Blocks': result['method4_zstd'],
+        }
+        best_packed = min(packed, key=packed.get)
+        print(f"  Best CSV + zstd-3: {best_packed} = {packed[best_packed]:,} bytes")
         if best_size < png_size:
             print(f"  ✓ {png_size / best_size:.2f}× BETTER than PNG")
         else:
@@ -265,5 +443,16 @@ def main():
     print("  • Hybrid: PNG for photos, Sempress for gradients/UI")
     print()
 
+def main():
+    # All measurements run before the first line is printed, so collect the
+    # report in memory and hand it to stdout in a single write
+    buf = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buf):
+            print_report()
+    finally:
+        sys.stdout.write(buf.getvalue())
+        sys.stdout.flush()
+
 if __name__ == '__main__':
     main()
@@ -4,12 +4,203 @@ Comprehensive data integrity test for Sempress compression.
 Tests numerical accuracy, column preservation, and statistical properties.
 """
 
+import os
 import sys
+import hashlib
+from itertools import zip_longest
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import tempfile
-import subprocess
+
+try:
+    # pyarrow streaming reader from the package, typed like pd.read_csv
+    from git_lfs_sempress.csvio import iter_csv_frames, ColumnTypeError
+except ImportError:
+    class ColumnTypeError(ValueError):
+        """A column parses as a different type further down the file"""
+        def __init__(self, column, dtype, message):
+            super().__init__(message)
+            self.column = column
+            self.dtype = dtype
+
+    def iter_csv_frames(path, chunk_rows, dtype=None):
+        return pd.read_csv(path, chunksize=chunk_rows, dtype=dtype)
+
+# Rows per chunk when streaming both CSVs; bounds memory regardless of file size
+CHUNK_ROWS = 1_000_000
+
+# Text columns: object, or pandas' string dtype (the default for text in pandas 3)
+STRING_DTYPES = ['object', 'string']
+
+def _sha256_file(path):
+    """SHA-256 hex digest of a file, streamed in 64 KB chunks"""
+    h = hashlib.sha256()
+    with open(path, 'rb', buffering=0) as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _update_moments(state, values):
+    """
+    Fold a chunk (rows x columns) into running NaN-skipping (count, sum, mean, M2),
+    merging per-chunk moments with Chan et al.'s parallel Welford update.
+    The plain sum is kept too so an inf mean comes out as nanmean reports it.
+    """
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=0)
+    total = np.where(valid, values, 0.0).sum(axis=0)
+    mean = np.divide(total, count, out=np.zeros_like(total), where=count > 0)
+    m2 = np.square(np.where(valid, values - mean, 0.0)).sum(axis=0)
+    n_a, total_a, mean_a, m2_a = state
+    n = n_a + count
+    delta = mean - mean_a
+    frac = np.divide(count, n, out=np.zeros_like(total), where=n > 0)
+    return n, total_a + total, mean_a + delta * frac, m2_a + m2 + delta * delta * n_a * frac
+
+def _finish_moments(state):
+    """Mean and sample (ddof=1) standard deviation from running moments"""
+    n, total, _, m2 = state
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / n
+        std = np.sqrt(m2 / (n - 1))
+    return mean, np.where(n > 1, std, np.nan)
+
+def _check_types(chunk, string_cols, numeric_cols):
+    """Raise ColumnTypeError for a column this chunk types unlike the first chunk"""
+    strings = set(chunk.select_dtypes(include=STRING_DTYPES).columns)
+    numbers = set(chunk.select_dtypes(include=[np.number]).columns)
+    for col in string_cols + numeric_cols:
+        if col in chunk.columns and col not in (strings if col in string_cols else numbers):
+            raise ColumnTypeError(col, str, f"Column {col} changes type between chunks")
+
+def _scan_csv_pair(original_csv, reconstructed_csv):
+    """
+    Stream both CSVs in lockstep CHUNK_ROWS at a time and accumulate everything
+    Tests 1-5 need, so neither file is ever held in memory whole.
+    
+    Column types are inferred from the start of each file, so a column can
+    turn out to hold values of another type further down (text after
+    numbers, say). The scan then starts over with that column read as the
+    wider type, which for text means comparing it as strings. A column that
+    still does not fit once read as that type is an error.
+    """
+    dtype = {}
+    while True:
+        try:
+            return _scan_chunks(original_csv, reconstructed_csv, dtype)
+        except ColumnTypeError as e:
+            if dtype.get(e.column) is e.dtype:
+                raise
+            dtype[e.column] = e.dtype
+
+def _columns(chunk, path):
+    """Column names of a file's first chunk, or of its header when it has no rows"""
+    if chunk is None:
+        chunk = pd.read_csv(path, nrows=0)
+    return list(chunk.columns)
+
+def _scan_chunks(original_csv, reconstructed_csv, dtype):
+    """One pass of _scan_csv_pair with the given column types"""
+    it_o = iter_csv_frames(original_csv, CHUNK_ROWS, dtype or None)
+    it_r = iter_csv_frames(reconstructed_csv, CHUNK_ROWS, dtype or None)
+    scan = {'rows_original': 0, 'rows_reconstructed': 0}
+    compared = 0
+    aligned = True
+    first = True
+    
+    for co, cr in zip_longest(it_o, it_r):
+        if co is not None:
+            scan['rows_original'] += len(co)
+        if cr is not None:
+            scan['rows_reconstructed'] += len(cr)
+        
+        if first:
+            # Column types come from the first chunk (the reconstruction's when
+            # the original has no rows); later chunks must agree
+            first = False
+            scan['columns_original'] = _columns(co, original_csv)
+            scan['columns_reconstructed'] = _columns(cr, reconstructed_csv)
+            typed = co if co is not None else cr
+            string_cols = list(typed.select_dtypes(include=STRING_DTYPES).columns)
+            numeric_cols = list(typed.select_dtypes(include=[np.number]).columns)
+            stats_cols = numeric_cols[:3]  # Test 5 looks at the first 3 numeric columns
+            k = len(numeric_cols)
+            scan['string_cols'] = string_cols
+            scan['numeric_cols'] = numeric_cols
+            scan['stats_cols'] = stats_cols
+            string_equal = dict.fromkeys(string_cols, True)
+            string_diffs = dict.fromkeys(string_cols, 0)
+            acc_abs = np.zeros(k)
+            acc_sq = np.zeros(k)
+            acc_max = np.zeros(k)
+            acc_orig = np.zeros(k)
+            bit_exact = np.ones(k, dtype=bool)
+            empty = tuple(np.zeros(len(stats_cols)) for _ in range(4))
+            moments_o = moments_r = empty
+        
+        for chunk in (co, cr):
+            if chunk is not None:
+                _check_types(chunk, string_cols, numeric_cols)
+        
+        # Once one file runs short the rest no longer lines up (Test 1 fails);
+        # compare the rows both files have and skip the remainder
+        if not aligned or co is None or cr is None:
+            aligned = False
+            continue
+        if len(co) != len(cr):
+            aligned = False
+            m = min(len(co), len(cr))
+            co = co.iloc[:m]
+            cr = cr.iloc[:m]
+        compared += len(co)
+        
+        for col in string_cols:
+            orig = co[col]
+            recon = cr[col]
+            if not orig.equals(recon):
+                string_equal[col] = False
+                # Count like .equals: missing in both places is not a difference
+                string_diffs[col] += int(((orig != recon) & ~(orig.isna() & recon.isna())).sum())
+        
+        if k:
+            orig = co[numeric_cols].to_numpy(dtype=np.float64)
+            recon = cr[numeric_cols].to_numpy(dtype=np.float64)
+            # Columns whose float64 bits match contribute no error; compare
+            # them as integers first and take differences of the rest only
+            same = np.array([np.array_equal(orig[:, j].view(np.int64), recon[:, j].view(np.int64))
+                             for j in range(k)])
+            bit_exact &= same
+            changed = np.flatnonzero(~same)
+            if changed.size:
+                diff = np.subtract(orig[:, changed], recon[:, changed])
+                abs_diff = np.abs(diff)
+                acc_abs[changed] += abs_diff.sum(axis=0)
+                acc_sq[changed] += (diff * diff).sum(axis=0)
+                acc_max[changed] = np.maximum(acc_max[changed], abs_diff.max(axis=0))
+            acc_orig += np.abs(orig).sum(axis=0)
+            moments_o = _update_moments(moments_o, orig[:, :len(stats_cols)])
+            moments_r = _update_moments(moments_r, recon[:, :len(stats_cols)])
+    
+    if first:
+        # Header-only files yield no chunks at all
+        scan['columns_original'] = _columns(None, original_csv)
+        scan['columns_reconstructed'] = _columns(None, reconstructed_csv)
+        scan.update(string_cols=[], numeric_cols=[], stats_cols=[])
+        return scan
+    
+    n = compared
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scan['mae'] = acc_abs / n
+        scan['rmse'] = np.sqrt(acc_sq / n)
+        scan['mean_abs'] = acc_orig / n
+    scan['max_error'] = acc_max
+    scan['bit_exact'] = bit_exact
+    scan['string_equal'] = string_equal
+    scan['string_diffs'] = string_diffs
+    scan['mean_original'], scan['std_original'] = _finish_moments(moments_o)
+    scan['mean_reconstructed'], scan['std_reconstructed'] = _finish_moments(moments_r)
+    return scan
 
 def test_compression_quality(original_csv, compressed_smp, reconstructed_csv):
     """
@@ -22,11 +213,14 @@ def test_compression_quality(original_csv, compressed_smp, reconstructed_csv):
     
     # Load data
     print("Loading data...")
-    df_original = pd.read_csv(original_csv)
-    df_reconstructed = pd.read_csv(reconstructed_csv)
+    scan = _scan_csv_pair(original_csv, reconstructed_csv)
+    columns_original = scan['columns_original']
+    columns_reconstructed = scan['columns_reconstructed']
+    shape_original = (scan['rows_original'], len(columns_original))
+    shape_reconstructed = (scan['rows_reconstructed'], len(columns_reconstructed))
     
-    print(f"  Original: {len(df_original)} rows, {len(df_original.columns)} columns")
-    print(f"  Reconstructed: {len(df_reconstructed)} rows, {len(df_reconstructed.columns)} columns")
+    print(f"  Original: {shape_original[0]} rows, {shape_original[1]} columns")
+    print(f"  Reconstructed: {shape_reconstructed[0]} rows, {shape_reconstructed[1]} columns")
     print()
     
     tests_passed = 0
@@ -34,25 +228,25 @@ def test_compression_quality(original_csv, compressed_smp, reconstructed_csv):
     
     # Test 1: Same shape
     print("Test 1: Shape preservation")
-    if df_original.shape == df_reconstructed.shape:
-        print("  ✓ Shape matches:", df_original.shape)
+    if shape_original == shape_reconstructed:
+        print("  ✓ Shape matches:", shape_original)
         tests_passed += 1
     else:
         print("  ✗ Shape mismatch!")
-        print(f"    Original: {df_original.shape}")
-        print(f"    Reconstructed: {df_reconstructed.shape}")
+        print(f"    Original: {shape_original}")
+        print(f"    Reconstructed: {shape_reconstructed}")
         tests_failed += 1
     print()
     
     # Test 2: Same columns
     print("Test 2: Column preservation")
-    if list(df_original.columns) == list(df_reconstructed.columns):
-        print(f"  ✓ All {len(df_original.columns)} columns preserved")
+    if columns_original == columns_reconstructed:
+        print(f"  ✓ All {len(columns_original)} columns preserved")
         tests_passed += 1
     else:
         print("  ✗ Column mismatch!")
-        missing = set(df_original.columns) - set(df_reconstructed.columns)
-        extra = set(df_reconstructed.columns) - set(df_original.columns)
+        missing = set(columns_original) - set(columns_reconstructed)
+        extra = set(columns_reconstructed) - set(columns_original)
         if missing:
             print(f"    Missing: {missing}")
         if extra:
@@ -62,15 +256,14 @@ def test_compression_quality(original_csv, compressed_smp, reconstructed_csv):
     
     # Test 3: Exact match for string/ID columns
     print("Test 3: Lossless string/ID columns")
-    string_cols = df_original.select_dtypes(include=['object']).columns
+    string_cols = scan['string_cols']
     if len(string_cols) > 0:
         all_match = True
         for col in string_cols:
-            if not df_original[col].equals(df_reconstructed[col]):
+            if not scan['string_equal'][col]:
                 all_match = False
                 print(f"  ✗ {col}: Mismatch!")
-                diff_count = (df_original[col] != df_reconstructed[col]).sum()
-                print(f"    {diff_count} differences")
+                print(f"    {scan['string_diffs'][col]} differences")
             else:
                 print(f"  ✓ {col}: Exact match")
         
@@ -85,20 +278,21 @@ def test_compression_quality(original_csv, compressed_smp, reconstructed_csv):
     
     # Test 4: Numerical accuracy
     print("Test 4: Numerical accuracy")
-    numeric_cols = df_original.select_dtypes(include=[np.number]).columns
+    numeric_cols = scan['numeric_cols']
     if len(numeric_cols) > 0:
         all_accurate = True
-        for col in numeric_cols:
-            orig = df_original[col].values
-            recon = df_reconstructed[col].values
+        for i, col in enumerate(numeric_cols):
+            if scan['bit_exact'][i]:
+                print(f"  {col}: ✓ bit-exact")
+                continue
             
-            # Calculate metrics
-            mae = np.mean(np.abs(orig - recon))
-            rmse = np.sqrt(np.mean((orig - recon) ** 2))
-            max_error = np.max(np.abs(orig - recon))
+            # Metrics accumulated chunk by chunk during the scan
+            mae = scan['mae'][i]
+            rmse = scan['rmse'][i]
+            max_error = scan['max_error'][i]
             
             # Relative error
-            mean_val = np.mean(np.abs(orig))
+            mean_val = scan['mean_abs'][i]
             if mean_val > 0:
                 rel_error = mae / mean_val * 100
             else:
@@ -130,11 +324,12 @@ def test_compression_quality(original_csv, compressed_smp, reconstructed_csv):
     print("Test 5: Statistical properties")
     if len(numeric_cols) > 0:
         all_stats_match = True
-        for col in numeric_cols[:3]:  # Test first 3 numeric columns
-            orig_mean = df_original[col].mean()
-            recon_mean = df_reconstructed[col].mean()
-            orig_std = df_original[col].std()
-            recon_std = df_reconstructed[col].std()
+        for i, col in enumerate(scan['stats_cols']):  # Test first 3 numeric columns
+            # NaN-skipping, sample (ddof=1) statistics, as pandas computes them
+            orig_mean = scan['mean_original'][i]
+            recon_mean = scan['mean_reconstructed'][i]
+            orig_std = scan['std_original'][i]
+            recon_std = scan['std_reconstructed'][i]
             
             mean_diff = abs(orig_mean - recon_mean) / abs(orig_mean) * 100
             std_diff = abs(orig_std - recon_std) / abs(orig_std) * 100
@@ -160,22 +355,20 @@ def test_compression_quality(original_csv, compressed_smp, reconstructed_csv):
     
     # Test 6: Byte-level comparison
     print("Test 6: Byte-level hash")
-    hash_original = subprocess.run(
-        ['sha256sum', original_csv],
-        capture_output=True,
-        text=True
-    ).stdout.split()[0]
-    
-    hash_reconstructed = subprocess.run(
-        ['sha256sum', reconstructed_csv],
-        capture_output=True,
-        text=True
-    ).stdout.split()[0]
-    
-    print(f"  Original: {hash_original[:16]}...")
-    print(f"  Reconstructed: {hash_reconstructed[:16]}...")
-    
-    if hash_original == hash_reconstructed:
+    # Files of different sizes cannot match; skip hashing them
+    size_original = os.path.getsize(original_csv)
+    size_reconstructed = os.path.getsize(reconstructed_csv)
+    if size_original != size_reconstructed:
+        print(f"  File sizes differ ({size_original:,} vs {size_reconstructed:,} bytes) — not bit-perfect")
+        hash_original = hash_reconstructed = None
+    else:
+        hash_original = _sha256_file(original_csv)
+        hash_reconstructed = _sha256_file(reconstructed_csv)
+        
+        print(f"  Original: {hash_original[:16]}...")
+        print(f"  Reconstructed: {hash_reconstructed[:16]}...")
+    
+    if hash_original is not None and hash_original == hash_reconstructed:
         print("  ✓ Bit-perfect reconstruction (SHA256 match)")
         tests_passed += 1
     else:
@@ -0,0 +1,101 @@
+"""
+Round trips through SempressCompressor and the codec, including the
+narrowed (fp16/int8) residual formats.
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from git_lfs_sempress import codec
+from git_lfs_sempress.compression import SempressCompressor, SMP_MAGIC, SMP_RESIDUAL_MAGIC
+from git_lfs_sempress.csvio import read_csv_frame
+
+pytestmark = pytest.mark.skipif(codec._fit_codebook is None or codec.decode_to_dataframe is None,
+                                reason='needs sempress with in-memory encode/decode')
+
+
+def _frame(n=500):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'id': np.arange(n),
+        'site': rng.choice(['north', 'south', 'east'], n),
+        'temp': rng.normal(20, 5, n).round(3),
+        'load': rng.uniform(0, 100, n).round(2),
+    })
+
+
+def _csv(df):
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False)
+    return buf.getvalue()
+
+
+def _compressor(precision):
+    return SempressCompressor({'residual_cols': ['temp'], 'residual_precision': precision})
+
+
+def test_lossless_columns_round_trip():
+    df = _frame()
+    compressor = _compressor('fp32')
+    blob = compressor.compress(_csv(df))
+    assert blob.startswith(SMP_MAGIC)
+    out = compressor.decompress_frame(blob)
+    assert list(out.columns) == list(df.columns)
+    assert out['site'].tolist() == df['site'].tolist()
+
+
+def test_fp32_residuals():
+    df = _frame()
+    out = _compressor('fp32').decompress_frame(_compressor('fp32').compress(_csv(df)))
+    # Residuals are taken against the float16 codebook as fitted, before
+    # sempress rounds it for storage, so that rounding remains
+    np.testing.assert_allclose(out['temp'], df['temp'], atol=0.02)
+
+
+@pytest.mark.parametrize('precision', ['fp16', 'int8'])
+def test_narrow_residual_round_trip(precision):
+    df = _frame()
+    csv_data = _csv(df)
+    reference = _compressor('fp32').decompress_frame(_compressor('fp32').compress(csv_data))
+    compressor = _compressor(precision)
+    blob = compressor.compress(csv_data)
+    assert blob.startswith(SMP_RESIDUAL_MAGIC)
+    out = compressor.decompress_frame(blob)
+    # Each residual is off by at most half a step of the narrower format,
+    # and no residual exceeds the codebook-only reconstruction error
+    codebook_only = SempressCompressor().decompress_frame(SempressCompressor().compress(csv_data))
+    peak = np.abs(df['temp'] - codebook_only['temp']).max() + 0.02
+    step = peak * 2.0 ** -11 if precision == 'fp16' else peak / 254
+    np.testing.assert_allclose(out['temp'], reference['temp'], atol=step)
+    pd.testing.assert_frame_equal(pd.read_csv(io.BytesIO(compressor.decompress(blob))), out,
+                                  check_dtype=False, atol=1e-6)
+
+
+def test_narrow_residuals_refused_by_stock_decoder():
+    blob = _compressor('int8').compress(_csv(_frame()))
+    with pytest.raises(AssertionError):
+        codec.unpack_container(blob)
+    with pytest.raises(ValueError, match='residuals'):
+        SempressCompressor()._decompress_via_tempfile(blob)
+
+
+def test_fp32_blob_decodes_with_stock_decoder(tmp_path):
+    df = _frame()
+    blob = _compressor('fp32').compress(_csv(df))
+    out = SempressCompressor()._decompress_via_tempfile(blob)
+    assert pd.read_csv(io.BytesIO(out))['site'].tolist() == df['site'].tolist()
+
+
+@pytest.mark.parametrize('config', [
+    {},
+    {'residual_cols': ['temp'], 'lock_cols': ['load']},
+    {'k': 300},
+])
+def test_encode_frame_matches_encode_csv(config):
+    csv_data = _csv(_frame())
+    encode_config = SempressCompressor(config)._encode_cfg
+    assert codec.encode_frame(read_csv_frame(csv_data), encode_config) == \
+        codec.encode_csv(io.BytesIO(csv_data), encode_config)
@@ -0,0 +1,50 @@
+"""
+SempressCompressor.estimate_compression_ratio, the cheap gate run on every
+cleaned file before committing to a full compression.
+"""
+
+import numpy as np
+import pytest
+
+from git_lfs_sempress.compression import ESTIMATE_SAMPLE_BYTES, SempressCompressor
+
+
+def _numeric_csv(rows=2000, distinct=8):
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, distinct, (rows, 3)) * 1.25 + 1000.0
+    return ('a,b,c\n' + ''.join(f'{a},{b},{c}\n' for a, b, c in values)).encode()
+
+
+def _text_csv(rows=2000):
+    return ('name,note\n' + ''.join(f'user{i},note {i * 7919 % 104729}\n' for i in range(rows))).encode()
+
+
+@pytest.mark.parametrize('data', [b'', b'a,b\n', b'\x00\x01\x02 not csv "'], ids=['empty', 'header', 'binary'])
+def test_unusable_input_estimates_one(data):
+    assert SempressCompressor().estimate_compression_ratio(data) == 1.0
+
+
+def test_numeric_beats_text():
+    compressor = SempressCompressor()
+    numeric = compressor.estimate_compression_ratio(_numeric_csv())
+    text = compressor.estimate_compression_ratio(_text_csv())
+    assert numeric > text >= 1.0
+    assert numeric <= 20.0
+
+
+def test_locked_and_residual_columns_lower_the_estimate():
+    data = _numeric_csv()
+    plain = SempressCompressor().estimate_compression_ratio(data)
+    locked = SempressCompressor({'lock_cols': ['a', 'b']}).estimate_compression_ratio(data)
+    assert locked < plain
+    ratios = [SempressCompressor({'residual_cols': ['a', 'b', 'c'], 'residual_precision': p})
+              .estimate_compression_ratio(data) for p in ('fp32', 'fp16', 'int8')]
+    assert ratios[0] < ratios[1] < ratios[2] < plain
+
+
+def test_estimate_uses_whole_rows_of_leading_sample():
+    data = _numeric_csv(rows=200_000)
+    assert len(data) > ESTIMATE_SAMPLE_BYTES
+    compressor = SempressCompressor()
+    assert compressor.estimate_compression_ratio(memoryview(data)) == \
+        compressor.estimate_compression_ratio(data[:data.rfind(b'\n', 0, ESTIMATE_SAMPLE_BYTES) + 1])
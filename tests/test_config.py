@@ -0,0 +1,116 @@
+"""
+Config discovery, merging with defaults, and the discovery/parse caches.
+"""
+
+import os
+import subprocess
+
+import pytest
+
+from git_lfs_sempress import config as config_module
+from git_lfs_sempress.config import Config, DEFAULT_CONFIG
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    root = tmp_path / 'repo'
+    (root / '.git').mkdir(parents=True)
+    (root / 'data').mkdir()
+    monkeypatch.chdir(root / 'data')
+    return root
+
+
+def _cached(start):
+    return start.resolve() in config_module._FIND_CACHE
+
+
+def _age(*dirs):
+    # Old enough for the discovery cache to trust their mtimes
+    for d in dirs:
+        stamp = os.stat(d).st_mtime - 3600
+        os.utime(d, (stamp, stamp))
+
+
+def test_defaults_without_config(repo):
+    config = Config()
+    assert config.config_path is None
+    assert config.config is DEFAULT_CONFIG
+
+
+def test_finds_config_in_parent(repo):
+    (repo / '.sempress.yml').write_text('compression:\n  k: 16\n')
+    config = Config()
+    assert config.config_path == repo / '.sempress.yml'
+    assert config.get_compression_config()['k'] == 16
+
+
+def test_json_preferred_over_yaml(repo):
+    (repo / '.sempress.yml').write_text('compression:\n  k: 16\n')
+    (repo / '.sempress.json').write_text('{"compression": {"k": 8}}')
+    assert Config().get_compression_config()['k'] == 8
+
+
+def test_stops_at_git_root(repo, tmp_path):
+    (tmp_path / '.sempress.yml').write_text('compression:\n  k: 16\n')
+    assert Config().config_path is None
+
+
+def test_sections_merge_with_defaults(repo):
+    (repo / '.sempress.yml').write_text('thresholds:\n  min_size_mb: 5\n')
+    config = Config()
+    assert config.get_thresholds()['min_size_mb'] == 5
+    assert config.get_thresholds()['min_compression_ratio'] == DEFAULT_CONFIG['thresholds']['min_compression_ratio']
+    # Untouched sections are shared with the read-only defaults
+    assert config.get_compression_config() is DEFAULT_CONFIG['compression']
+    with pytest.raises(TypeError):
+        config.get_thresholds()['min_size_mb'] = 1
+
+
+def test_discovery_cache_sees_new_config(repo):
+    _age(repo, repo / 'data')
+    assert Config().config_path is None
+    assert _cached(repo / 'data')
+    (repo / '.sempress.yml').write_text('compression:\n  k: 16\n')
+    assert Config().config_path == repo / '.sempress.yml'
+
+
+def test_discovery_cache_sees_removed_config(repo):
+    (repo / '.sempress.yml').write_text('compression:\n  k: 16\n')
+    _age(repo, repo / 'data')
+    assert Config().config_path == repo / '.sempress.yml'
+    (repo / '.sempress.yml').unlink()
+    assert Config().config_path is None
+
+
+def test_recent_directories_not_cached(repo):
+    assert Config().config_path is None
+    assert not _cached(repo / 'data')
+
+
+def test_parse_cache_follows_edits(repo):
+    path = repo / '.sempress.yml'
+    path.write_text('compression:\n  k: 16\n')
+    assert Config(path).get_compression_config()['k'] == 16
+    path.write_text('compression:\n  k: 32\n')
+    stamp = os.stat(path).st_mtime + 1
+    os.utime(path, (stamp, stamp))
+    assert Config(path).get_compression_config()['k'] == 32
+
+
+def test_stats_reports_json_config(tmp_path, monkeypatch):
+    from click.testing import CliRunner
+    from git_lfs_sempress.cli import main
+    subprocess.run(['git', 'init', '-q', str(tmp_path)], check=True)
+    subprocess.run(['git', '-C', str(tmp_path), 'config', 'filter.lfs-sempress.clean', 'git-lfs-sempress clean %f'],
+                   check=True)
+    (tmp_path / '.sempress.json').write_text('{"compression": {"k": 16}}')
+    monkeypatch.chdir(tmp_path)
+    result = CliRunner().invoke(main, ['stats'])
+    assert result.exit_code == 0, result.output
+    assert f"Config file: {tmp_path / '.sempress.json'}" in result.output
+    assert 'k: 16' in result.output
+    
+    # init leaves the JSON config alone rather than adding a .sempress.yml
+    result = CliRunner().invoke(main, ['init'])
+    assert result.exit_code == 0, result.output
+    assert not (tmp_path / '.sempress.yml').exists()
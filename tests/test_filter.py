@@ -0,0 +1,313 @@
+"""
+Clean/smudge filter behaviour, driven through in-memory streams.
+"""
+
+import io
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from git_lfs_sempress.compression import ESTIMATE_SAMPLE_BYTES, SMP_MAGICS
+from git_lfs_sempress.config import Config
+from git_lfs_sempress.cli import main
+from git_lfs_sempress.filter import (
+    MAX_PKT_DATA, PKT_FLUSH, SempressFilter, prune_cache, _handshake, _parse_headers, _read_pkt,
+    _read_pkt_content, _read_pkt_list, _write_pkt_content, _write_pkt_text, _write_response,
+    _write_status,
+)
+
+
+def _config(tmp_path, **thresholds):
+    settings = {'min_size_mb': 1, 'min_compression_ratio': 1.0, **thresholds}
+    path = tmp_path / '.sempress.yml'
+    path.write_text('thresholds:\n' + ''.join(f'  {k}: {v}\n' for k, v in settings.items()) +
+                    'cache:\n  enabled: false\n')
+    return Config(path)
+
+
+def _csv(n_bytes):
+    rng = np.random.default_rng(0)
+    rows = []
+    size = len('site,temp,load\n')
+    while size < n_bytes:
+        row = f"s{rng.integers(4)},{rng.normal(20, 5):.3f},{rng.uniform(0, 100):.2f}\n"
+        rows.append(row)
+        size += len(row)
+    return ('site,temp,load\n' + ''.join(rows)).encode()
+
+
+def _clean(filter_obj, data, **kwargs):
+    out = io.BytesIO()
+    filter_obj.clean(io.BytesIO(data), output_stream=out, **kwargs)
+    return out.getvalue()
+
+
+def _smudge(filter_obj, data):
+    out = io.BytesIO()
+    filter_obj.smudge(io.BytesIO(data), output_stream=out)
+    return out.getvalue()
+
+
+@pytest.fixture(scope='module')
+def large_csv():
+    # Past the leading sample, so the size is not known from the head alone
+    return _csv(ESTIMATE_SAMPLE_BYTES + (ESTIMATE_SAMPLE_BYTES >> 1))
+
+
+def test_small_input_passes_through(tmp_path):
+    data = _csv(10_000)
+    assert _clean(SempressFilter(_config(tmp_path)), data) == data
+
+
+def test_clean_smudge_round_trip(tmp_path, large_csv):
+    filter_obj = SempressFilter(_config(tmp_path))
+    blob = _clean(filter_obj, large_csv)
+    assert blob.startswith(SMP_MAGICS)
+    restored = _smudge(filter_obj, blob)
+    assert restored.splitlines()[0] == b'site,temp,load'
+    assert len(restored.splitlines()) == len(large_csv.splitlines())
+
+
+def test_stale_working_tree_size_does_not_gate(tmp_path, large_csv):
+    # git add -p and friends clean content that differs from the file on disk
+    stale = tmp_path / 'data.csv'
+    stale.write_bytes(b'site,temp,load\n')
+    blob = _clean(SempressFilter(_config(tmp_path)), large_csv, filename=str(stale))
+    assert blob.startswith(SMP_MAGICS)
+
+
+def test_exact_size_gates_before_reading(tmp_path, large_csv):
+    filter_obj = SempressFilter(_config(tmp_path, min_size_mb=2))
+    assert _clean(filter_obj, large_csv, size=len(large_csv)) == large_csv
+    assert _clean(filter_obj, large_csv) == large_csv
+
+
+@pytest.mark.parametrize('verbose', [False, True])
+def test_clean_command_logs_warnings_only(tmp_path, verbose):
+    # Git shows a filter's stderr for every file, so INFO stays quiet unless -v
+    _config(tmp_path, min_size_mb=0)
+    data = _csv(50_000)
+    args = [sys.executable, '-m', 'git_lfs_sempress'] + (['-v'] if verbose else []) + ['clean', 'data.csv']
+    result = subprocess.run(args, cwd=tmp_path, input=data, capture_output=True, check=True)
+    assert result.stdout.startswith(SMP_MAGICS)
+    assert (b'INFO' in result.stderr) is verbose
+
+
+def test_smudge_passes_through_plain_data(tmp_path):
+    data = _csv(1000)
+    assert _smudge(SempressFilter(_config(tmp_path)), data) == data
+
+
+def _cache_config(tmp_path, max_size_mb):
+    path = tmp_path / '.sempress.yml'
+    path.write_text('thresholds:\n  min_size_mb: 0\n  min_compression_ratio: 1.0\n'
+                    f'cache:\n  enabled: true\n  max_size_mb: {max_size_mb}\n')
+    return Config(path)
+
+
+def _cache_entry(cache_dir, name, size, age):
+    path = cache_dir / f'{name}.smp'
+    path.write_bytes(b'x' * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_prune_cache_drops_least_recently_used(tmp_path):
+    old = _cache_entry(tmp_path, 'old', 400, age=300)
+    mid = _cache_entry(tmp_path, 'mid', 400, age=200)
+    new = _cache_entry(tmp_path, 'new', 400, age=100)
+    (tmp_path / 'other.tmp').write_bytes(b'x' * 4000)
+    assert prune_cache(tmp_path, 1000) == (1, 400)
+    assert not old.exists() and mid.exists() and new.exists()
+    assert prune_cache(tmp_path, 0) == (2, 800)
+    assert (tmp_path / 'other.tmp').exists()
+
+
+def test_cache_hit_and_bound(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    cache_dir.mkdir()
+    filter_obj = SempressFilter(_cache_config(tmp_path, 0.01))
+    filter_obj.cache_dir = cache_dir
+    data = _csv(20_000)
+    blob = _clean(filter_obj, data)
+    entry, = cache_dir.iterdir()
+    assert entry.read_bytes() == blob
+    
+    # A hit marks the entry as recently used
+    stamp = time.time() - 3600
+    os.utime(entry, (stamp, stamp))
+    assert _clean(filter_obj, data) == blob
+    assert entry.stat().st_mtime > stamp + 60
+    
+    # Storing a new entry prunes the cache back under max_size_mb
+    stale = _cache_entry(cache_dir, 'stale', 10_000, age=7200)
+    _clean(filter_obj, _csv(30_000))
+    assert not stale.exists()
+    assert sum(p.stat().st_size for p in cache_dir.iterdir()) <= 0.01 * 1024 * 1024
+
+
+def test_cache_prune_command(tmp_path, monkeypatch):
+    subprocess.run(['git', 'init', '-q', str(tmp_path)], check=True)
+    monkeypatch.chdir(tmp_path)
+    cache_dir = tmp_path / '.git' / 'sempress-cache'
+    cache_dir.mkdir()
+    _cache_entry(cache_dir, 'a', 1000, age=100)
+    result = CliRunner().invoke(main, ['cache', 'prune', '--max-mb', '0'])
+    assert result.exit_code == 0, result.output
+    assert 'Removed 1 cache entries' in result.output
+    assert not any(cache_dir.iterdir())
+
+
+def _pkts(*lines):
+    """Encode text pkt-lines followed by a flush packet"""
+    out = io.BytesIO()
+    for line in lines:
+        _write_pkt_text(out, line)
+    out.write(PKT_FLUSH)
+    return out.getvalue()
+
+
+def test_pkt_line_round_trip():
+    out = io.BytesIO()
+    _write_pkt_text(out, 'command=clean')
+    out.write(PKT_FLUSH)
+    data = bytes(range(256)) * 600  # spans several maximum-size packets
+    _write_pkt_content(out, data)
+    assert out.getvalue().startswith(b'0012command=clean\n0000')
+    
+    stream = io.BytesIO(out.getvalue())
+    assert _read_pkt_list(stream) == ['command=clean']
+    assert _read_pkt_content(stream) == data
+    with pytest.raises(EOFError):
+        _read_pkt(stream)
+
+
+def test_pkt_line_truncated():
+    with pytest.raises(ValueError):
+        _read_pkt(io.BytesIO(b'0010abc'))
+    with pytest.raises(ValueError):
+        _read_pkt(io.BytesIO(b'00'))
+
+
+def test_handshake():
+    client = io.BytesIO(_pkts('git-filter-client', 'version=2') +
+                        _pkts('capability=clean', 'capability=smudge', 'capability=delay'))
+    server = io.BytesIO()
+    assert _handshake(client, server, ('clean', 'smudge')) == ['clean', 'smudge']
+    reply = io.BytesIO(server.getvalue())
+    assert _read_pkt_list(reply) == ['git-filter-server', 'version=2']
+    assert _read_pkt_list(reply) == ['capability=clean', 'capability=smudge']
+
+
+def test_handshake_rejects_unknown_protocol():
+    with pytest.raises(ValueError):
+        _handshake(io.BytesIO(_pkts('git-filter-client', 'version=3')), io.BytesIO())
+
+
+class _CountingStream(io.BytesIO):
+    flushes = 0
+    
+    def flush(self):
+        self.flushes += 1
+
+
+def test_response_flushed_once():
+    out = _CountingStream()
+    _write_response(out, bytes(MAX_PKT_DATA * 3))
+    assert out.flushes == 1
+    stream = io.BytesIO(out.getvalue())
+    assert _read_pkt_list(stream) == ['status=success']
+    assert _read_pkt_content(stream) == bytes(MAX_PKT_DATA * 3)
+    assert _read_pkt_list(stream) == []
+    
+    out = _CountingStream()
+    _write_status(out, 'delayed')
+    assert out.flushes == 1 and out.getvalue() == b'0013status=delayed\n0000'
+
+
+class _FilterProcess:
+    """Minimal Git-side driver for 'git-lfs-sempress process'"""
+    
+    def __init__(self, cwd):
+        self.proc = subprocess.Popen([sys.executable, '-m', 'git_lfs_sempress', 'process'], cwd=cwd,
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.proc.stdin.write(_pkts('git-filter-client', 'version=2') +
+                              _pkts('capability=clean', 'capability=smudge', 'capability=delay'))
+        self.proc.stdin.flush()
+        assert _read_pkt_list(self.proc.stdout) == ['git-filter-server', 'version=2']
+        self.capabilities = _read_pkt_list(self.proc.stdout)
+    
+    def request(self, headers, content=b''):
+        out = io.BytesIO()
+        _write_pkt_content(out, content)
+        self.proc.stdin.write(_pkts(*headers) + out.getvalue())
+        self.proc.stdin.flush()
+        return _parse_headers(_read_pkt_list(self.proc.stdout))
+    
+    def filter(self, command, pathname, content, **extra):
+        headers = [f'command={command}', f'pathname={pathname}'] + [f'{k}={v}' for k, v in extra.items()]
+        status = self.request(headers, content)
+        if status.get('status') != 'success':
+            return status, None
+        result = _read_pkt_content(self.proc.stdout)
+        return {**status, **_parse_headers(_read_pkt_list(self.proc.stdout))}, result
+    
+    def close(self):
+        self.proc.stdin.close()
+        assert self.proc.wait(timeout=60) == 0
+
+
+@pytest.fixture
+def filter_process(tmp_path):
+    (tmp_path / '.sempress.yml').write_text(
+        'thresholds:\n  min_size_mb: 0\n  min_compression_ratio: 1.0\n'
+        'cache:\n  enabled: false\n'
+        'process:\n  workers: 2\n')
+    process = _FilterProcess(tmp_path)
+    yield process
+    process.close()
+
+
+def test_process_clean_smudge(filter_process):
+    data = _csv(50_000)
+    status, blob = filter_process.filter('clean', 'data.csv', data)
+    assert status['status'] == 'success' and blob.startswith(SMP_MAGICS)
+    status, restored = filter_process.filter('smudge', 'data.csv', blob)
+    assert status['status'] == 'success'
+    assert len(restored.splitlines()) == len(data.splitlines())
+    # Content that is not Sempress data comes back unchanged
+    assert filter_process.filter('smudge', 'plain.csv', b'a,b\n1,2\n')[1] == b'a,b\n1,2\n'
+
+
+def test_process_delayed_smudge(filter_process):
+    # Delay is offered because the config asks for more than one worker
+    assert filter_process.capabilities == ['capability=clean', 'capability=smudge', 'capability=delay']
+    blobs = {}
+    for name in ('a.csv', 'b.csv'):
+        blobs[name] = filter_process.filter('clean', name, _csv(50_000))[1]
+        status, _ = filter_process.filter('smudge', name, blobs[name], **{'can-delay': 1})
+        assert status == {'status': 'delayed'}
+    
+    ready = set()
+    while ready != set(blobs):
+        paths = _read_list_available(filter_process)
+        assert paths, 'list_available_blobs returned nothing while blobs were pending'
+        for name in paths:
+            status, restored = filter_process.filter('smudge', name, b'')
+            assert status['status'] == 'success'
+            assert restored.startswith(b'site,temp,load\n')
+            ready.add(name)
+
+
+def _read_list_available(process):
+    process.proc.stdin.write(_pkts('command=list_available_blobs'))
+    process.proc.stdin.flush()
+    paths = [line.partition('=')[2] for line in _read_pkt_list(process.proc.stdout)]
+    assert _read_pkt_list(process.proc.stdout) == ['status=success']
+    return paths
@@ -0,0 +1,114 @@
+"""
+In-memory MultiFormatCompressor round trips for non-CSV inputs.
+"""
+
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from git_lfs_sempress import codec
+from git_lfs_sempress.compression import SempressCompressor
+from git_lfs_sempress.formats import MultiFormatCompressor
+
+pytestmark = pytest.mark.skipif(codec.decode_to_dataframe is None,
+                                reason='needs sempress with in-memory decode')
+
+RECORDS = [{'site': f's{i % 4}', 'reading': i} for i in range(200)]
+
+
+@pytest.mark.parametrize('intermediate', ['frame', 'csv'])
+def test_json_round_trip(intermediate):
+    mfc = MultiFormatCompressor(SempressCompressor(), intermediate)
+    data = json.dumps(RECORDS).encode()
+    blob, metadata = mfc.compress(data, 'readings.json')
+    assert metadata['intermediate'] == intermediate
+    out = pd.read_json(io.BytesIO(mfc.decompress(blob, metadata, 'readings.json')))
+    assert out['site'].tolist() == [r['site'] for r in RECORDS]
+
+
+def test_frame_is_default():
+    assert MultiFormatCompressor(SempressCompressor()).intermediate == 'frame'
+
+
+def test_legacy_parquet_label_decodes():
+    mfc = MultiFormatCompressor(SempressCompressor())
+    blob, metadata = mfc.compress(json.dumps(RECORDS).encode(), 'readings.json')
+    metadata['intermediate'] = 'parquet'
+    out = pd.read_json(io.BytesIO(mfc.decompress(blob, metadata, 'readings.json')))
+    assert out['site'].tolist() == [r['site'] for r in RECORDS]
+
+
+@pytest.fixture(params=['numpy', 'numba'])
+def scatter(request, monkeypatch):
+    """Route frame_to_image's x/y scatter through NumPy or the Numba kernel"""
+    from git_lfs_sempress import formats
+    if request.param == 'numba':
+        pytest.importorskip('numba')
+        monkeypatch.setattr(formats, 'NUMBA_MIN_PIXELS', 0)
+    else:
+        monkeypatch.setattr(formats, 'NUMBA_AVAILABLE', False)
+    return request.param
+
+
+def _xy_image(df, width, height):
+    from PIL import Image
+    from git_lfs_sempress.formats import FormatConverter
+    out = io.BytesIO()
+    FormatConverter.frame_to_image(df, out, {'width': width, 'height': height, 'mode': 'RGB',
+                                             'original_format': 'PNG'})
+    return np.asarray(Image.open(io.BytesIO(out.getvalue())))
+
+
+def test_frame_to_image_from_xy_table(scatter):
+    pytest.importorskip('PIL')
+    df = pd.DataFrame({
+        'x': [0, 1.7, 2, 5, -1, None],
+        'y': [0, 0, 1, 0, 0, 1],
+        'r': [10, 300, -5, 1, 1, 1],
+        'g': [20, 0, 0, 1, 1, 1],
+        'b': [30, 0, 0, 1, 1, 1],
+    })
+    pixels = _xy_image(df, 3, 2)
+    expected = np.zeros((2, 3, 3), dtype=np.uint8)
+    expected[0, 0] = [10, 20, 30]
+    expected[0, 1] = [255, 0, 0]  # x truncates toward zero, values clip to [0, 255]
+    # (2, 1) is clipped to 0; rows outside the image or without x are dropped
+    np.testing.assert_array_equal(pixels, expected)
+
+
+def test_numba_scatter_matches_numpy(monkeypatch):
+    pytest.importorskip('PIL')
+    pytest.importorskip('numba')
+    from git_lfs_sempress import formats
+    rng = np.random.default_rng(0)
+    width, height = 64, 48
+    # Every pixel once, in shuffled order, plus rows outside the image
+    ys, xs = np.divmod(rng.permutation(width * height), width)
+    df = pd.DataFrame({
+        'x': np.concatenate([xs + rng.random(xs.size) * 0.99, [-3, width, 5]]),
+        'y': np.concatenate([ys, [0, 0, height + 2]]),
+        **{c: rng.uniform(-50, 300, xs.size + 3) for c in 'rgb'},
+    })
+    monkeypatch.setattr(formats, 'NUMBA_MIN_PIXELS', 0)
+    jit = _xy_image(df, width, height)
+    monkeypatch.setattr(formats, 'NUMBA_AVAILABLE', False)
+    np.testing.assert_array_equal(jit, _xy_image(df, width, height))
+
+
+def test_image_to_frame_keeps_uint8_channels():
+    pytest.importorskip('PIL')
+    from PIL import Image
+    from git_lfs_sempress.formats import FormatConverter
+    pixels = np.random.default_rng(0).integers(0, 256, (6, 5, 4), dtype=np.uint8)
+    png = io.BytesIO()
+    Image.fromarray(pixels, mode='RGBA').save(png, format='PNG')
+    df, metadata = FormatConverter.image_to_frame(io.BytesIO(png.getvalue()))
+    assert list(df.columns) == ['r', 'g', 'b', 'alpha']
+    assert (df.dtypes == np.uint8).all()
+    np.testing.assert_array_equal(df.to_numpy(), pixels.reshape(-1, 4))
+    out = io.BytesIO()
+    FormatConverter.frame_to_image(df, out, metadata)
+    np.testing.assert_array_equal(np.asarray(Image.open(io.BytesIO(out.getvalue()))), pixels)
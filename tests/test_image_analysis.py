@@ -0,0 +1,40 @@
+"""
+calculate_psnr and the cached pixel arrays of scripts/image-compression-analysis.py.
+"""
+
+import importlib.util
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip('PIL')
+pytest.importorskip('zstandard')
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'scripts' / 'image-compression-analysis.py'
+
+
+@pytest.fixture(scope='module')
+def analysis():
+    spec = importlib.util.spec_from_file_location('image_analysis', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_psnr(analysis):
+    a = np.zeros((4, 4, 3), dtype=np.uint8)
+    b = np.full((4, 4, 3), 255, dtype=np.uint8)
+    assert analysis.calculate_psnr(a, a) == float('inf')
+    # uint8 subtraction would wrap 0 - 255 around to 1
+    assert analysis.calculate_psnr(a, b) == pytest.approx(0.0)
+    assert analysis.calculate_psnr(b, a) == pytest.approx(0.0)
+    assert analysis.calculate_psnr(a, a + 1) == pytest.approx(20 * np.log10(255))
+
+
+@pytest.mark.parametrize('key', ['method1', 'method4'])
+def test_array_methods_accept_cached_pixels(analysis, key):
+    _, fn, kwargs, uses_pixels = next(m for m in analysis.METHODS if m[0] == key)
+    assert uses_pixels
+    img = analysis.create_test_images()['gradient']
+    assert fn(np.asarray(img), **kwargs).equals(fn(img, **kwargs))
@@ -0,0 +1,106 @@
+"""
+scripts/quality-test.py streams both CSVs in chunks; these run it with small
+chunks so the chunk boundaries fall inside the test files.
+"""
+
+import importlib.util
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from git_lfs_sempress import csvio
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'scripts' / 'quality-test.py'
+
+
+@pytest.fixture(params=['pyarrow', 'pandas'])
+def quality(request, monkeypatch):
+    if request.param == 'pandas':
+        monkeypatch.setattr(csvio, 'pacsv', None)
+    spec = importlib.util.spec_from_file_location('quality_test', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module, 'CHUNK_ROWS', 1000)
+    return module
+
+
+def _write_csv(path, rows):
+    path.write_text('id,name,value\n' + ''.join(f'{i},{n},{v}\n' for i, n, v in rows))
+    return path
+
+
+def test_identical_files_pass(quality, tmp_path):
+    rows = [(i, f'n{i % 7}', i * 0.25) for i in range(2500)]
+    path = _write_csv(tmp_path / 'a.csv', rows)
+    assert quality.test_compression_quality(path, path, path) == 0
+
+
+def test_type_drift_across_chunks(quality, tmp_path):
+    # 'value' is numeric for the first chunk and holds text from row 1500 on
+    rows = [(i, f'n{i % 7}', i if i < 1500 else f'x{i}') for i in range(2500)]
+    path = _write_csv(tmp_path / 'drift.csv', rows)
+    scan = quality._scan_csv_pair(path, path)
+    assert scan['numeric_cols'] == ['id']
+    assert scan['string_cols'] == ['name', 'value']
+    assert scan['string_equal'] == {'name': True, 'value': True}
+    assert scan['bit_exact'].all()
+    assert quality.test_compression_quality(path, path, path) == 0
+
+
+def test_type_drift_in_reconstruction(quality, tmp_path):
+    original = _write_csv(tmp_path / 'a.csv', [(i, 'n', i) for i in range(2500)])
+    rows = [(i, 'n', i if i != 2100 else 'oops') for i in range(2500)]
+    reconstructed = _write_csv(tmp_path / 'b.csv', rows)
+    scan = quality._scan_csv_pair(original, reconstructed)
+    assert scan['string_cols'] == ['name', 'value']
+    assert scan['string_diffs']['value'] == 1
+    assert quality.test_compression_quality(original, original, reconstructed) == 1
+
+
+def test_metrics_across_chunks(quality, tmp_path):
+    values = np.arange(2500) * 0.5
+    original = _write_csv(tmp_path / 'a.csv', [(i, 'n', v) for i, v in enumerate(values)])
+    reconstructed = _write_csv(tmp_path / 'b.csv', [(i, 'n', v + 0.25) for i, v in enumerate(values)])
+    scan = quality._scan_csv_pair(original, reconstructed)
+    assert scan['rows_original'] == scan['rows_reconstructed'] == 2500
+    assert list(scan['bit_exact']) == [True, False]
+    assert scan['mae'][1] == pytest.approx(0.25)
+    assert scan['max_error'][1] == pytest.approx(0.25)
+    assert scan['mean_original'][1] == pytest.approx(values.mean())
+    assert scan['std_original'][1] == pytest.approx(values.std(ddof=1))
+
+
+@pytest.mark.parametrize('header_only', ['original', 'reconstructed'])
+def test_header_only_against_rows(quality, tmp_path, header_only):
+    empty = _write_csv(tmp_path / 'empty.csv', [])
+    full = _write_csv(tmp_path / 'full.csv', [(1, 'n', 2.5)])
+    original, reconstructed = (empty, full) if header_only == 'original' else (full, empty)
+    scan = quality._scan_csv_pair(original, reconstructed)
+    assert scan['columns_original'] == scan['columns_reconstructed'] == ['id', 'name', 'value']
+    assert (scan['rows_original'], scan['rows_reconstructed']) == \
+        ((0, 1) if header_only == 'original' else (1, 0))
+    assert quality.test_compression_quality(original, original, reconstructed) == 1
+
+
+def test_string_columns_selected_without_deprecated_alias(quality, tmp_path):
+    path = _write_csv(tmp_path / 'a.csv', [(i, f'n{i}', i) for i in range(10)])
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        scan = quality._scan_csv_pair(path, path)
+    assert scan['string_cols'] == ['name']
+
+
+def test_repeated_type_error_is_raised(quality, tmp_path, monkeypatch):
+    path = _write_csv(tmp_path / 'a.csv', [(1, 'n', 2)])
+    calls = []
+    
+    def scan_chunks(original, reconstructed, dtype):
+        calls.append(dict(dtype))
+        raise quality.ColumnTypeError('value', str, 'still does not fit')
+    
+    monkeypatch.setattr(quality, '_scan_chunks', scan_chunks)
+    with pytest.raises(quality.ColumnTypeError):
+        quality._scan_csv_pair(path, path)
+    assert calls == [{}, {'value': str}]